@@ -1,19 +1,40 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, responses
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Header, Request, Response, status, responses
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
 import bcrypt
+import orjson
+from pyinstrument import Profiler
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 from enum import Enum
 import json
+import re
+import base64
+import csv
+import io
+import hashlib
+import asyncio
+import math
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import parse_qsl, urlencode
 from bson.objectid import ObjectId
 
 # Custom JSON encoder to handle ObjectId
@@ -33,9 +54,303 @@ SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
+# Password hashing pool configuration
+PASSWORD_POOL_KIND = os.environ.get("PASSWORD_POOL_KIND", "thread")  # "thread" or "process"
+PASSWORD_POOL_WORKERS = int(os.environ.get("PASSWORD_POOL_WORKERS", "4"))
+PASSWORD_POOL_MAX_QUEUE = int(os.environ.get("PASSWORD_POOL_MAX_QUEUE", "64"))
+
+# Authentication cache configuration
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+ANSWER_KEY_CACHE_SIZE = int(os.environ.get("ANSWER_KEY_CACHE_SIZE", "256"))
+QUIZ_PAYLOAD_CACHE_SIZE = int(os.environ.get("QUIZ_PAYLOAD_CACHE_SIZE", "512"))
+BULK_IMPORT_CHUNK_SIZE = int(os.environ.get("BULK_IMPORT_CHUNK_SIZE", "500"))
+BULK_IMPORT_MAX_LINE_BYTES = int(os.environ.get("BULK_IMPORT_MAX_LINE_BYTES", "1048576"))
+REGRADE_WORKERS = int(os.environ.get("REGRADE_WORKERS", "1"))
+REGRADE_BATCH_SIZE = int(os.environ.get("REGRADE_BATCH_SIZE", "500"))
+THEORY_PASS_RATIO = float(os.environ.get("THEORY_PASS_RATIO", "0.5"))
+GRADING_WORKERS = int(os.environ.get("GRADING_WORKERS", "2"))
+GRADING_POLL_INTERVAL_SECONDS = float(os.environ.get("GRADING_POLL_INTERVAL_SECONDS", "5"))
+GRADING_LEASE_SECONDS = int(os.environ.get("GRADING_LEASE_SECONDS", "60"))
+GRADING_MAX_TRIES = int(os.environ.get("GRADING_MAX_TRIES", "3"))
+SUBMIT_GRACE_SECONDS = int(os.environ.get("SUBMIT_GRACE_SECONDS", "30"))
+DEADLINE_SWEEP_INTERVAL_SECONDS = float(os.environ.get("DEADLINE_SWEEP_INTERVAL_SECONDS", "30"))
+DEADLINE_SWEEP_BATCH_SIZE = int(os.environ.get("DEADLINE_SWEEP_BATCH_SIZE", "500"))
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT_SECONDS", "15"))
+EVENT_TICKET_TTL_SECONDS = int(os.environ.get("EVENT_TICKET_TTL_SECONDS", "60"))
+AUTOSAVE_FLUSH_INTERVAL_SECONDS = float(os.environ.get("AUTOSAVE_FLUSH_INTERVAL_SECONDS", "2"))
+AUTOSAVE_MAX_PENDING = int(os.environ.get("AUTOSAVE_MAX_PENDING", "5000"))
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+ANALYTICS_CACHE_TTL_SECONDS = float(os.environ.get("ANALYTICS_CACHE_TTL_SECONDS", "10"))
+# When enabled, id and role are taken from the signed token instead of the database
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
+# Event loop watchdog configuration (off by default)
+LOOP_WATCHDOG_ENABLED = os.environ.get("LOOP_WATCHDOG_ENABLED", "false").lower() == "true"
+LOOP_WATCHDOG_INTERVAL_SECONDS = float(os.environ.get("LOOP_WATCHDOG_INTERVAL_SECONDS", "0.1"))
+LOOP_BLOCK_THRESHOLD_SECONDS = float(os.environ.get("LOOP_BLOCK_THRESHOLD_SECONDS", "0.25"))
+LOOP_BLOCK_SAMPLES = int(os.environ.get("LOOP_BLOCK_SAMPLES", "50"))
+
+# Distinct query shapes remembered for the index report
+QUERY_SHAPE_LIMIT = int(os.environ.get("QUERY_SHAPE_LIMIT", "1000"))
+
+# On-demand request profiling (admins send X-Profile: 1 or ?profile=1)
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_SECONDS", "0.001"))
+PROFILE_RETENTION_SECONDS = int(os.environ.get("PROFILE_RETENTION_SECONDS", "86400"))
+
+# Metrics
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency by collection",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+MONGO_FAILURES = Counter("mongo_command_failures_total", "Failed MongoDB commands", ["collection", "command"])
+
+# Query shapes
+# The filter fields and sort keys of every query actually sent to MongoDB,
+# so the index report checks real traffic against real indexes.
+def filter_branches(query: dict) -> List[tuple]:
+    # (equality, ranges) field sets per disjunct: each $or branch is planned as its
+    # own index scan, with the fields outside the $or applying to every branch
+    branches = [(set(), set())]
+    for field, value in query.items():
+        if field in ("$and", "$or"):
+            clauses = [filter_branches(clause) for clause in value]
+            if field == "$and":
+                for clause in clauses:
+                    branches = [(equality | more[0], ranges | more[1]) for equality, ranges in branches for more in clause]
+            else:
+                options = [option for clause in clauses for option in clause]
+                branches = [(equality | more[0], ranges | more[1]) for equality, ranges in branches for more in options]
+        elif field == "$nor":
+            # A negated field cannot serve as an equality prefix
+            negated = {name for clause in value for option in filter_branches(clause) for name in option[0] | option[1]}
+            for _, ranges in branches:
+                ranges.update(negated)
+        elif field.startswith("$"):
+            continue
+        elif isinstance(value, dict) and any(key.startswith("$") for key in value) and "$eq" not in value:
+            for _, ranges in branches:
+                ranges.add(field)
+        else:
+            for equality, _ in branches:
+                equality.add(field)
+    return branches
+
+def command_queries(command_name: str, command) -> List[tuple]:
+    # (filter, sort) pairs carried by a command; writes and cursors paging add nothing new
+    if command_name == "find":
+        return [(command.get("filter"), command.get("sort"))]
+    if command_name == "findAndModify":
+        return [(command.get("query"), command.get("sort"))]
+    if command_name in ("count", "distinct"):
+        return [(command.get("query"), None)]
+    if command_name == "update":
+        return [(update.get("q"), None) for update in command.get("updates", [])]
+    if command_name == "delete":
+        return [(delete.get("q"), None) for delete in command.get("deletes", [])]
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        if pipeline and "$match" in pipeline[0]:
+            sort = pipeline[1].get("$sort") if len(pipeline) > 1 else None
+            return [(pipeline[0]["$match"], sort)]
+        if pipeline and "$sort" in pipeline[0]:
+            return [(None, pipeline[0]["$sort"])]
+    return []
+
+def index_covers(keys: List[tuple], shape: dict) -> bool:
+    # Equality fields first, then the sort keys (ESR); ranges may follow or be filtered after the fetch
+    fields = [field for field, _ in keys]
+    equality = shape["equality"]
+    sort = shape["sort"]
+    prefix = 0
+    while prefix < len(fields) and fields[prefix] in equality:
+        prefix += 1
+    if equality and prefix == 0:
+        return False
+    if sort:
+        return fields[prefix:prefix + len(sort)] == sort
+    return prefix > 0 or bool(fields) and fields[0] in shape["range"]
+
+class QueryShapeRecorder:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.shapes: Dict[tuple, int] = {}
+        self.dropped = 0
+        # Index keys per collection, refreshed by ensure_indexes and the index report
+        self.indexes: Dict[str, List[list]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, collection: str, query: Optional[dict], sort):
+        keys = []
+        for equality, ranges in filter_branches(query or {}):
+            ranges -= equality
+            sort_fields = [field for field in (sort or {}) if field not in equality]
+            if not equality and not ranges and not sort_fields:
+                return  # a full scan by design
+            keys.append((collection, tuple(sorted(equality)), tuple(sorted(ranges)), tuple(sort_fields)))
+        new_keys = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self.shapes:
+                    self.shapes[key] += 1
+                elif len(self.shapes) >= self.limit:
+                    self.dropped += 1
+                else:
+                    self.shapes[key] = 1
+                    new_keys.append(key)
+        known = self.indexes.get(collection)
+        if known is None:
+            return
+        # A query is covered only when every one of its branches is
+        for key in new_keys:
+            shape = self.shape(key, 1)
+            if not any(index_covers(index_keys, shape) for index_keys in known):
+                logger.warning(
+                    f"Query on {collection} by {shape['equality'] + shape['range']} sorted by {shape['sort']} has no index"
+                )
+
+    @staticmethod
+    def shape(key: tuple, count: int) -> dict:
+        collection, equality, ranges, sort = key
+        return {"collection": collection, "equality": list(equality), "range": list(ranges), "sort": list(sort), "count": count}
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            items = list(self.shapes.items())
+        return [self.shape(key, count) for key, count in items]
+
+query_shapes = QueryShapeRecorder(QUERY_SHAPE_LIMIT)
+
+# Times every command Motor sends and records its query shape; listener
+# callbacks run on the driver's threads
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+        if isinstance(target, str):
+            self._collections[(event.connection_id, event.request_id)] = target
+            for query, sort in command_queries(event.command_name, event.command):
+                query_shapes.record(target, query, sort)
+
+    def _finish(self, event):
+        return self._collections.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+            MONGO_FAILURES.labels(collection, event.command_name).inc()
+
+# Event loop watchdog
+# A heartbeat task measures scheduling lag on the loop; a watcher thread notices
+# when the heartbeat stops and samples the loop thread's stack while it is blocked.
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between a scheduled loop wakeup and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_BLOCKS = Counter("event_loop_blocks_total", "Loop stalls over the threshold by blocking call site", ["location"])
+
+class LoopWatchdog:
+    def __init__(self, interval: float, threshold: float, max_samples: int):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = deque(maxlen=max_samples)
+        self.blocks = 0
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._stalled = False
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self._beat = now
+            self._stalled = False
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked < self.threshold or self._stalled:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            # Report each stall once, at the point it first crosses the threshold
+            self._stalled = True
+            self.record(blocked, frame)
+
+    def record(self, blocked: float, frame):
+        stack = traceback.format_stack(frame)
+        location = "unknown"
+        # Attribute the stall to the innermost frame in our own code
+        while frame is not None:
+            if frame.f_code.co_filename.startswith(str(ROOT_DIR)):
+                location = f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}"
+                break
+            frame = frame.f_back
+        self.blocks += 1
+        LOOP_BLOCKS.labels(location).inc()
+        self.samples.append({
+            "at": utcnow(),
+            "blocked_seconds": round(blocked, 4),
+            "location": location,
+            "stack": stack,
+        })
+        logger.warning(f"Event loop blocked for {blocked:.3f}s in {location}\n{''.join(stack)}")
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "threshold_seconds": self.threshold,
+            "blocks": self.blocks,
+            "max_lag_seconds": round(self.max_lag, 4),
+            "samples": list(self.samples),
+        }
+
+loop_watchdog = LoopWatchdog(LOOP_WATCHDOG_INTERVAL_SECONDS, LOOP_BLOCK_THRESHOLD_SECONDS, LOOP_BLOCK_SAMPLES)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# tz_aware makes every BSON date come back as an aware UTC datetime
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[MongoCommandMetrics()])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -47,6 +362,13 @@ api_router = APIRouter(prefix="/api")
 # Security
 security = HTTPBearer()
 
+# All timestamps are timezone-aware UTC and stored as native BSON dates
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
 # Enums
 class UserRole(str, Enum):
     ADMIN = "admin"
@@ -63,7 +385,7 @@ class User(BaseModel):
     email: str
     password: str
     role: UserRole
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utcnow)
 
 class UserCreate(BaseModel):
     username: str
@@ -75,6 +397,10 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+class RubricItem(BaseModel):
+    keywords: List[str]  # any one of these words or phrases earns the item
+    weight: float = 1.0
+
 class Question(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     question_text: str
@@ -83,8 +409,9 @@ class Question(BaseModel):
     correct_answer: str
     explanation: str
     points: int = 1
+    rubric: Optional[List[RubricItem]] = None  # For theory questions
     created_by: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utcnow)
 
 class QuestionCreate(BaseModel):
     question_text: str
@@ -93,6 +420,7 @@ class QuestionCreate(BaseModel):
     correct_answer: str
     explanation: str
     points: int = 1
+    rubric: Optional[List[RubricItem]] = None
 
 class Quiz(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -101,7 +429,7 @@ class Quiz(BaseModel):
     questions: List[str]  # Question IDs
     time_limit: int  # in minutes
     created_by: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utcnow)
     is_active: bool = True
 
 class QuizCreate(BaseModel):
@@ -117,19 +445,70 @@ class QuizAttempt(BaseModel):
     answers: Dict[str, str]  # question_id -> answer
     score: Optional[int] = None
     max_score: Optional[int] = None
-    started_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: datetime = Field(default_factory=utcnow)
+    deadline_at: Optional[datetime] = None  # started_at + time_limit, enforced by the server
     submitted_at: Optional[datetime] = None
     time_taken: Optional[int] = None  # in seconds
+    auto_submitted: bool = False
+    grading_status: Optional[str] = None  # "pending" while theory answers are queued, then "complete"
+    theory_results: Optional[Dict[str, Any]] = None
 
 class QuizSubmission(BaseModel):
     quiz_id: str
     answers: Dict[str, str]
 
+class AnswerDelta(BaseModel):
+    answers: Dict[str, str]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
     user: dict
 
+# In-process LRU cache with optional per-entry expiry (ttl=None never expires)
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+analytics_cache = TTLCache(16, ANALYTICS_CACHE_TTL_SECONDS)
+answer_key_cache = TTLCache(ANSWER_KEY_CACHE_SIZE)
+quiz_payload_cache = TTLCache(QUIZ_PAYLOAD_CACHE_SIZE)
+
 # Helper functions
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -137,39 +516,175 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+# Runs in the worker, so the measured time excludes waiting in the executor queue
+def timed_call(fn, *args) -> tuple:
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+# bcrypt is deliberately slow (~200ms), so it runs off the event loop in a
+# bounded pool. Once workers + queue are full we shed load with a 429.
+class PasswordWorkerPool:
+    def __init__(self, kind: str, max_workers: int, max_queue: int):
+        executor_cls = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = executor_cls(max_workers=max_workers)
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.avg_seconds = 0.2
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.in_flight - self.max_workers)
+
+    def retry_after(self) -> int:
+        backlog = self.queued + 1
+        return max(1, math.ceil(backlog / self.max_workers * self.avg_seconds))
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, seconds = await loop.run_in_executor(self.executor, timed_call, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+        # Exponential moving average of the work itself keeps Retry-After close to real cost
+        self.avg_seconds = 0.9 * self.avg_seconds + 0.1 * seconds
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_seconds": round(self.avg_seconds, 4),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+password_pool = PasswordWorkerPool(PASSWORD_POOL_KIND, PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_QUEUE)
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await password_pool.run(verify_password, password, hashed)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def token_claims_for(user: dict) -> dict:
+    return {"sub": user["username"], "uid": user["id"], "role": UserRole(user["role"]).value}
+
+async def load_user(username: str) -> Optional[User]:
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    user_data = await db.users.find_one({"username": username})
+    if user_data is None:
+        return None
+    # Remove MongoDB ObjectId before creating User object
+    if "_id" in user_data:
+        del user_data["_id"]
+    user = User(**user_data)
+    user_cache.set(username, user)
+    return user
+
+def invalidate_user(username: str):
+    user_cache.invalidate(username)
+
+async def authenticate_token(token: str) -> User:
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid token")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = await db.users.find_one({"username": username})
+    # Stateless path: the signature already vouches for id and role
+    if AUTH_TRUST_TOKEN_CLAIMS and payload.get("uid") and payload.get("role"):
+        return User.construct(
+            id=payload["uid"],
+            username=username,
+            email="",
+            password="",
+            role=UserRole(payload["role"]),
+        )
+    
+    user = await load_user(username)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     
-    # Remove MongoDB ObjectId before creating User object
-    if "_id" in user:
-        del user["_id"]
-    
-    return User(**user)
+    return user
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
 
 async def get_admin_user(current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
+# Opaque keyset cursors over (timestamp, id); page depth never affects query cost
+def encode_cursor(timestamp: datetime, doc_id: str) -> str:
+    raw = json.dumps({"t": timestamp.isoformat(), "id": doc_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return as_utc(datetime.fromisoformat(raw["t"])), raw["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_fields(fields: Optional[str], model) -> Optional[dict]:
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(model.__fields__)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # id and created_at are always returned because the cursor is built from them
+    return {"_id": 0, "id": 1, "created_at": 1, **{field: 1 for field in requested}}
+
+async def find_page(collection, query: dict, limit: int, after: Optional[str], projection: Optional[dict]) -> tuple:
+    if after:
+        created_at, last_id = decode_cursor(after)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "id": {"$gt": last_id}},
+        ]}]}
+    cursor = collection.find(query, projection or {"_id": 0}).sort([("created_at", ASCENDING), ("id", ASCENDING)])
+    docs = await cursor.limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["id"])
+    return docs, next_cursor
+
 # Authentication Routes
-@api_router.post("/register", response_model=Token)
+@api_router.post("/register", response_class=ORJSONResponse)
 async def register(user: UserCreate):
     # Check if user exists
     existing_user = await db.users.find_one({"$or": [{"username": user.username}, {"email": user.email}]})
@@ -177,119 +692,482 @@ async def register(user: UserCreate):
         raise HTTPException(status_code=400, detail="Username or email already exists")
     
     # Hash password
-    hashed_password = hash_password(user.password)
-    
-    # Create user
-    user_dict = user.dict()
-    user_dict["password"] = hashed_password
-    user_obj = User(**user_dict)
-    user_data = user_obj.dict()
-    
-    # Remove MongoDB ObjectId if it exists and use our custom id
-    if "_id" in user_data:
-        del user_data["_id"]
+    hashed_password = await hash_password_async(user.password)
     
+    # Create user; the request model was validated on the way in
+    user_data = User(**user.dict(exclude={"password"}), password=hashed_password).dict()
     await db.users.insert_one(user_data)
+    user_data.pop("_id", None)
+    invalidate_user(user.username)
     
     # Create token
-    access_token = create_access_token(data={"sub": user.username})
-    user_dict.pop("password")
+    access_token = create_access_token(data=token_claims_for(user_data))
+    user_data.pop("password")
     
-    return {"access_token": access_token, "token_type": "bearer", "user": user_dict}
+    return ORJSONResponse({"access_token": access_token, "token_type": "bearer", "user": user_data})
 
-@api_router.post("/login", response_model=Token)
+@api_router.post("/login", response_class=ORJSONResponse)
 async def login(user_credentials: UserLogin):
     user = await db.users.find_one({"username": user_credentials.username})
-    if not user or not verify_password(user_credentials.password, user["password"]):
+    if not user or not await verify_password_async(user_credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    access_token = create_access_token(data={"sub": user["username"]})
+    access_token = create_access_token(data=token_claims_for(user))
     
     # Remove MongoDB ObjectId and password from response
     if "_id" in user:
         del user["_id"]
     user.pop("password")
     
-    return {"access_token": access_token, "token_type": "bearer", "user": user}
+    return ORJSONResponse({"access_token": access_token, "token_type": "bearer", "user": user})
 
 @api_router.get("/me")
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    user_dict = current_user.dict()
+    # Token claims do not carry the full profile, so always resolve the stored user here
+    user = await load_user(current_user.username)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    user_dict = user.dict()
     user_dict.pop("password")
     return user_dict
 
 # Question Management Routes (Admin only)
-@api_router.post("/questions", response_model=Question)
+@api_router.post("/questions", response_class=ORJSONResponse)
 async def create_question(question: QuestionCreate, current_user: User = Depends(get_admin_user)):
-    question_dict = question.dict()
-    question_dict["created_by"] = current_user.id
-    question_obj = Question(**question_dict)
-    question_data = question_obj.dict()
-    
-    # Remove MongoDB ObjectId if it exists
-    if "_id" in question_data:
-        del question_data["_id"]
-        
+    question_data = Question(**question.dict(), created_by=current_user.id).dict()
     await db.questions.insert_one(question_data)
-    return question_obj
+    question_data.pop("_id", None)
+    return ORJSONResponse(question_data)
 
-@api_router.get("/questions", response_model=List[Question])
-async def get_questions(current_user: User = Depends(get_admin_user)):
-    questions = await db.questions.find().to_list(1000)
-    # Remove MongoDB ObjectId from each question
-    for question in questions:
-        if "_id" in question:
-            del question["_id"]
-    return [Question(**q) for q in questions]
+# Bulk import accepts a JSON array, NDJSON (one question per line) or CSV with a
+# header row. CSV options are a JSON array or "|"-separated; records must not
+# span lines. Items are validated and inserted in unordered chunks.
+def request_line(raw) -> tuple:
+    if len(raw) > BULK_IMPORT_MAX_LINE_BYTES:
+        return None, f"Line exceeds {BULK_IMPORT_MAX_LINE_BYTES} bytes"
+    try:
+        return raw.decode("utf-8"), None
+    except UnicodeDecodeError as e:
+        return None, f"Invalid UTF-8: {e}"
+
+# Yields (line, error) pairs. Each chunk is searched for newlines only from where
+# the previous search stopped, and an oversized line is dropped up to its newline
+# rather than buffered, so a body without newlines costs linear time and bounded memory.
+async def iter_request_lines(request: Request):
+    pending = bytearray()
+    skipping = False
+    async for chunk in request.stream():
+        scanned = len(pending)
+        pending += chunk
+        start = 0
+        while (end := pending.find(b"\n", max(start, scanned))) >= 0:
+            if skipping:
+                skipping = False
+            else:
+                yield request_line(pending[start:end])
+            start = end + 1
+        del pending[:start]
+        if skipping:
+            pending.clear()
+        elif len(pending) > BULK_IMPORT_MAX_LINE_BYTES:
+            yield request_line(pending)
+            pending.clear()
+            skipping = True
+    if pending:
+        yield request_line(pending)
+
+def csv_question_item(header: List[str], line: str) -> dict:
+    item = dict(zip(header, next(csv.reader([line]))))
+    options = item.get("options")
+    if options:
+        item["options"] = json.loads(options) if options.startswith("[") else options.split("|")
+    else:
+        item["options"] = None
+    if item.get("points"):
+        item["points"] = int(item["points"])
+    else:
+        item.pop("points", None)
+    return item
+
+async def iter_bulk_items(request: Request):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "application/json":
+        try:
+            items = await request.json()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of questions")
+        for index, item in enumerate(items):
+            yield index, item, None
+    elif content_type in ("application/x-ndjson", "application/jsonl"):
+        index = 0
+        async for line, error in iter_request_lines(request):
+            if error is not None:
+                yield index, None, error
+            elif not line.strip():
+                continue
+            else:
+                try:
+                    yield index, json.loads(line), None
+                except ValueError as e:
+                    yield index, None, f"Invalid JSON: {e}"
+            index += 1
+    elif content_type == "text/csv":
+        header = None
+        index = 0
+        async for line, error in iter_request_lines(request):
+            if error is None and not line.strip():
+                continue
+            if header is None:
+                if error is not None:
+                    raise HTTPException(status_code=400, detail=f"Invalid CSV header: {error}")
+                header = [column.strip() for column in next(csv.reader([line]))]
+                continue
+            if error is not None:
+                yield index, None, error
+            else:
+                try:
+                    yield index, csv_question_item(header, line), None
+                except (ValueError, csv.Error) as e:
+                    yield index, None, f"Invalid CSV row: {e}"
+            index += 1
+    else:
+        raise HTTPException(status_code=415, detail="Use application/json, application/x-ndjson or text/csv")
+
+# Returns the ids of the questions that were written, in input order
+async def insert_question_chunk(chunk: List[tuple], errors: List[dict]) -> List[str]:
+    if not chunk:
+        return []
+    try:
+        await db.questions.insert_many([doc for _, doc in chunk], ordered=False)
+        return [doc["id"] for _, doc in chunk]
+    except BulkWriteError as e:
+        failed = set()
+        for write_error in e.details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            errors.append({"index": chunk[write_error["index"]][0], "error": write_error.get("errmsg", "Write failed")})
+        return [doc["id"] for position, (_, doc) in enumerate(chunk) if position not in failed]
+
+@api_router.post("/questions/bulk")
+async def bulk_create_questions(request: Request, current_user: User = Depends(get_admin_user)):
+    started = time.perf_counter()
+    inserted_ids = []
+    total = 0
+    errors = []
+    chunk = []
+    
+    async for index, item, error in iter_bulk_items(request):
+        total += 1
+        if error is None:
+            try:
+                question = Question(**QuestionCreate(**item).dict(), created_by=current_user.id)
+                chunk.append((index, question.dict()))
+            except (ValidationError, TypeError) as e:
+                error = str(e)
+        if error is not None:
+            errors.append({"index": index, "error": error})
+        if len(chunk) >= BULK_IMPORT_CHUNK_SIZE:
+            inserted_ids += await insert_question_chunk(chunk, errors)
+            chunk = []
+    inserted_ids += await insert_question_chunk(chunk, errors)
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "total": total,
+        "inserted": len(inserted_ids),
+        "ids": inserted_ids,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda e: e["index"]),
+        "elapsed_seconds": round(elapsed, 3),
+        "items_per_second": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+
+# Read paths hand Mongo documents straight to orjson. Everything stored went
+# through a model at the write boundary, so re-validating here only costs time.
+def list_response(docs: List[dict], next_cursor: Optional[str]) -> ORJSONResponse:
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(docs, headers=headers)
+
+@api_router.get("/questions", response_class=ORJSONResponse)
+async def get_questions(
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_admin_user),
+):
+    projection = parse_fields(fields, Question)
+    questions, next_cursor = await find_page(db.questions, {}, limit, after, projection)
+    return list_response(questions, next_cursor)
+
+# Fields whose change alters how existing attempts are scored
+GRADING_FIELDS = ("question_type", "correct_answer", "points", "rubric")
+
+@api_router.put("/questions/{question_id}")
+async def update_question(question_id: str, question: QuestionCreate, current_user: User = Depends(get_admin_user)):
+    question_dict = question.dict()
+    existing = await db.questions.find_one_and_update(
+        {"id": question_id},
+        {"$set": question_dict},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not existing:
+        raise HTTPException(status_code=404, detail="Question not found")
+    quiz_ids = await invalidate_question_caches(question_id)
+    
+    regrade_job_id = None
+    if quiz_ids and any(existing.get(field) != question_dict[field] for field in GRADING_FIELDS):
+        regrade_job_id = await regrade_queue.enqueue(question_id, quiz_ids)
+    
+    return {"question": Question(**{**existing, **question_dict}), "regrade_job_id": regrade_job_id}
 
 @api_router.delete("/questions/{question_id}")
 async def delete_question(question_id: str, current_user: User = Depends(get_admin_user)):
     result = await db.questions.delete_one({"id": question_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Question not found")
+    await invalidate_question_caches(question_id)
     return {"message": "Question deleted successfully"}
 
 # Quiz Management Routes (Admin only)
-@api_router.post("/quizzes", response_model=Quiz)
+@api_router.post("/quizzes", response_class=ORJSONResponse)
 async def create_quiz(quiz: QuizCreate, current_user: User = Depends(get_admin_user)):
-    quiz_dict = quiz.dict()
-    quiz_dict["created_by"] = current_user.id
-    quiz_obj = Quiz(**quiz_dict)
-    quiz_data = quiz_obj.dict()
-    
-    # Remove MongoDB ObjectId if it exists
-    if "_id" in quiz_data:
-        del quiz_data["_id"]
-        
+    quiz_data = Quiz(**quiz.dict(), created_by=current_user.id).dict()
     await db.quizzes.insert_one(quiz_data)
-    return quiz_obj
+    quiz_data.pop("_id", None)
+    return ORJSONResponse(quiz_data)
 
-@api_router.get("/quizzes", response_model=List[Quiz])
-async def get_quizzes(current_user: User = Depends(get_current_user)):
-    quizzes = await db.quizzes.find({"is_active": True}).to_list(1000)
-    # Remove MongoDB ObjectId from each quiz
-    for quiz in quizzes:
-        if "_id" in quiz:
-            del quiz["_id"]
-    return [Quiz(**q) for q in quizzes]
+@api_router.get("/quizzes", response_class=ORJSONResponse)
+async def get_quizzes(
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    projection = parse_fields(fields, Quiz)
+    quizzes, next_cursor = await find_page(db.quizzes, {"is_active": True}, limit, after, projection)
+    return list_response(quizzes, next_cursor)
 
-@api_router.get("/quizzes/{quiz_id}")
-async def get_quiz(quiz_id: str, current_user: User = Depends(get_current_user)):
-    quiz = await db.quizzes.find_one({"id": quiz_id})
-    if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    # Get questions for the quiz
-    questions = await db.questions.find({"id": {"$in": quiz["questions"]}}).to_list(1000)
-    
+def build_quiz_payload(quiz: dict, questions: List[dict], role: UserRole) -> bytes:
     # For students, don't send correct answers and explanations
-    if current_user.role == UserRole.STUDENT:
+    if role == UserRole.STUDENT:
         for question in questions:
             question.pop("correct_answer", None)
             question.pop("explanation", None)
+            question.pop("rubric", None)
     
     quiz["question_details"] = questions
-    return quiz
+    return orjson.dumps(quiz)
+
+# Serialized quiz bodies are cached per (quiz_id, role) together with their ETag
+async def render_quiz_payload(quiz_id: str, role: UserRole) -> Optional[tuple]:
+    cached = quiz_payload_cache.get((quiz_id, role.value))
+    if cached is not None:
+        return cached
+    
+    quiz = await db.quizzes.find_one({"id": quiz_id}, {"_id": 0})
+    if not quiz:
+        return None
+    
+    # Get questions for the quiz
+    questions = await db.questions.find({"id": {"$in": quiz["questions"]}}, {"_id": 0}).to_list(None)
+    body = build_quiz_payload(quiz, questions, role)
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    quiz_payload_cache.set((quiz_id, role.value), (etag, body))
+    return etag, body
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+@api_router.get("/quizzes/{quiz_id}")
+async def get_quiz(
+    quiz_id: str,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+):
+    payload = await render_quiz_payload(quiz_id, current_user.role)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    etag, body = payload
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Theory scoring
+# A rubric is compiled once into an n-gram -> rubric item index. Scoring an answer
+# is then one set intersection between its n-grams and the rubric vocabulary, and
+# a batch of answers reuses the compiled index. Without an explicit rubric the
+# keywords are derived from the question's correct_answer.
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in into is it its of on onto or that the this to upon was were which with".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class CompiledRubric:
+    def __init__(self, items: List[tuple]):
+        self.weights = []
+        self.index: Dict[tuple, List[int]] = {}
+        self.max_ngram = 1
+        for item_index, (phrases, weight) in enumerate(items):
+            self.weights.append(weight)
+            for phrase in phrases:
+                tokens = tuple(tokenize(phrase))
+                if tokens:
+                    self.index.setdefault(tokens, []).append(item_index)
+                    self.max_ngram = max(self.max_ngram, len(tokens))
+        self.total_weight = sum(self.weights)
+        self.vocabulary = frozenset(self.index)
+
+    @classmethod
+    def from_question(cls, question: dict) -> "CompiledRubric":
+        rubric = question.get("rubric")
+        if rubric:
+            return cls([(item["keywords"], item.get("weight", 1.0)) for item in rubric])
+        keywords = [token for token in dict.fromkeys(tokenize(question["correct_answer"])) if token not in STOPWORDS]
+        return cls([([keyword], 1.0) for keyword in keywords])
+
+    def ngrams(self, tokens: List[str]) -> set:
+        grams = set()
+        for n in range(1, self.max_ngram + 1):
+            grams.update(zip(*(tokens[i:] for i in range(n))))
+        return grams
+
+    def score_batch(self, answers: List[str]) -> List[float]:
+        # Fraction of rubric weight matched per answer, in [0, 1]
+        if not self.total_weight:
+            return [1.0 if answer.strip() else 0.0 for answer in answers]
+        scores = []
+        for answer in answers:
+            matched = set()
+            for gram in self.ngrams(tokenize(answer)) & self.vocabulary:
+                matched.update(self.index[gram])
+            scores.append(sum(self.weights[i] for i in matched) / self.total_weight)
+        return scores
+
+    def score(self, answer: str) -> float:
+        return self.score_batch([answer])[0]
+
+# Grading
+# A quiz's questions compiled once into normalized answers and points, so grading
+# a submission is pure in-memory work. Cached until a question or quiz changes.
+class AnswerKey:
+    def __init__(self, quiz: dict, questions: List[dict]):
+        by_id = {question["id"]: question for question in questions}
+        self.quiz_id = quiz["id"]
+        self.time_limit = quiz["time_limit"]
+        self.is_active = quiz.get("is_active", True)
+        self.questions = []
+        for question_id in dict.fromkeys(quiz["questions"]):
+            question = by_id.get(question_id)
+            if question is None:
+                continue
+            self.questions.append((
+                question_id,
+                question["question_type"],
+                question["correct_answer"].strip().lower(),
+                question["points"],
+                question["correct_answer"],
+                question["explanation"],
+                question["question_text"],
+            ))
+        self.max_score = sum(question[3] for question in self.questions)
+        self.theory_question_ids = [question[0] for question in self.questions if question[1] != "objective"]
+        self.rubrics = {question_id: CompiledRubric.from_question(by_id[question_id]) for question_id in self.theory_question_ids}
+
+    def grade(self, answers: Dict[str, str], defer_theory: bool = False) -> tuple:
+        score = 0
+        results = {}
+        for question_id, question_type, normalized, points, correct_answer, explanation, question_text in self.questions:
+            student_answer = answers.get(question_id, "")
+            if question_type == "objective":
+                is_correct = student_answer.strip().lower() == normalized
+            elif defer_theory:
+                is_correct = None  # graded later by the grading queue
+            else:
+                is_correct = self.rubrics[question_id].score(student_answer) >= THEORY_PASS_RATIO
+            
+            if is_correct:
+                score += points
+            
+            results[question_id] = {
+                "student_answer": student_answer,
+                "correct_answer": correct_answer,
+                "is_correct": is_correct,
+                "explanation": explanation,
+                "question_text": question_text
+            }
+        return score, results
+
+    def grade_theory(self, answers: Dict[str, str]) -> tuple:
+        score = 0
+        results = {}
+        for question_id, question_type, _, points, _, _, _ in self.questions:
+            if question_type == "objective":
+                continue
+            rubric_score = self.rubrics[question_id].score(answers.get(question_id, ""))
+            is_correct = rubric_score >= THEORY_PASS_RATIO
+            if is_correct:
+                score += points
+            results[question_id] = {
+                "is_correct": is_correct,
+                "rubric_score": round(rubric_score, 3),
+                "points": points if is_correct else 0,
+            }
+        return score, results
+
+    def grade_batch(self, answer_sets: List[Dict[str, str]]) -> List[tuple]:
+        # Question-major so each theory rubric scores the whole batch in one call
+        scores = [0] * len(answer_sets)
+        theory_results = [{} for _ in answer_sets]
+        for question_id, question_type, normalized, points, _, _, _ in self.questions:
+            answers = [answer_set.get(question_id, "") for answer_set in answer_sets]
+            if question_type == "objective":
+                for i, answer in enumerate(answers):
+                    if answer.strip().lower() == normalized:
+                        scores[i] += points
+                continue
+            for i, rubric_score in enumerate(self.rubrics[question_id].score_batch(answers)):
+                is_correct = rubric_score >= THEORY_PASS_RATIO
+                if is_correct:
+                    scores[i] += points
+                theory_results[i][question_id] = {
+                    "is_correct": is_correct,
+                    "rubric_score": round(rubric_score, 3),
+                    "points": points if is_correct else 0,
+                }
+        return list(zip(scores, theory_results))
+
+async def get_answer_key(quiz_id: str) -> Optional[AnswerKey]:
+    answer_key = answer_key_cache.get(quiz_id)
+    if answer_key is not None:
+        return answer_key
+    quiz = await db.quizzes.find_one({"id": quiz_id})
+    if not quiz:
+        return None
+    questions = await db.questions.find({"id": {"$in": quiz["questions"]}}).to_list(None)
+    answer_key = AnswerKey(quiz, questions)
+    answer_key_cache.set(quiz_id, answer_key)
+    return answer_key
+
+def invalidate_quiz_caches(quiz_id: str):
+    answer_key_cache.invalidate(quiz_id)
+    for role in UserRole:
+        quiz_payload_cache.invalidate((quiz_id, role.value))
+
+async def invalidate_question_caches(question_id: str) -> List[str]:
+    quiz_ids = [quiz["id"] async for quiz in db.quizzes.find({"questions": question_id}, {"_id": 0, "id": 1})]
+    for quiz_id in quiz_ids:
+        invalidate_quiz_caches(quiz_id)
+    return quiz_ids
 
 # Quiz Attempt Routes (Students)
 @api_router.post("/quizzes/{quiz_id}/start")
@@ -298,106 +1176,811 @@ async def start_quiz(quiz_id: str, current_user: User = Depends(get_current_user
         raise HTTPException(status_code=403, detail="Only students can take quizzes")
     
     # Check if quiz exists
-    quiz = await db.quizzes.find_one({"id": quiz_id, "is_active": True})
-    if not quiz:
+    answer_key = await get_answer_key(quiz_id)
+    if answer_key is None or not answer_key.is_active:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    # Check if student has already attempted this quiz
-    existing_attempt = await db.quiz_attempts.find_one({"quiz_id": quiz_id, "student_id": current_user.id})
-    if existing_attempt:
+    # Create the attempt only if none exists; the unique (quiz_id, student_id)
+    # index turns a concurrent double start into a duplicate key error
+    started_at = utcnow()
+    attempt = QuizAttempt(
+        quiz_id=quiz_id,
+        student_id=current_user.id,
+        answers={},
+        started_at=started_at,
+        deadline_at=started_at + timedelta(minutes=answer_key.time_limit),
+    )
+    try:
+        result = await db.quiz_attempts.update_one(
+            {"quiz_id": quiz_id, "student_id": current_user.id},
+            {"$setOnInsert": attempt.dict()},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        result = None
+    if result is None or result.upserted_id is None:
         raise HTTPException(status_code=400, detail="You have already attempted this quiz")
+    await record_attempt_started(quiz_id)
+    event_broker.publish("attempt_started", quiz_id=quiz_id, student_id=current_user.id, attempt_id=attempt.id)
+    
+    return {
+        "message": "Quiz started",
+        "attempt_id": attempt.id,
+        "time_limit": answer_key.time_limit,
+        "deadline_at": attempt.deadline_at
+    }
+
+# Deadlines
+# Attempts still open SUBMIT_GRACE_SECONDS after their deadline are closed with
+# their autosaved answers. The sweeper walks the (submitted_at, deadline_at)
+# index in deadline order, so it only touches expired attempts.
+async def close_expired_attempts(extra_filter: Optional[dict] = None, limit: int = DEADLINE_SWEEP_BATCH_SIZE) -> int:
+    await autosave_buffer.flush()
+    cutoff = utcnow() - timedelta(seconds=SUBMIT_GRACE_SECONDS)
+    query = {"submitted_at": None, "deadline_at": {"$lt": cutoff}, **(extra_filter or {})}
+    projection = {"_id": 0, "id": 1, "quiz_id": 1, "student_id": 1, "answers": 1, "started_at": 1, "deadline_at": 1}
+    attempts = await db.quiz_attempts.find(query, projection).sort("deadline_at", ASCENDING).limit(limit).to_list(limit)
     
-    # Create new attempt
-    attempt = QuizAttempt(quiz_id=quiz_id, student_id=current_user.id, answers={})
-    await db.quiz_attempts.insert_one(attempt.dict())
+    by_quiz: Dict[str, List[dict]] = {}
+    for attempt in attempts:
+        by_quiz.setdefault(attempt["quiz_id"], []).append(attempt)
     
-    return {"message": "Quiz started", "attempt_id": attempt.id, "time_limit": quiz["time_limit"]}
+    closed = 0
+    for quiz_id, batch in by_quiz.items():
+        answer_key = await get_answer_key(quiz_id)
+        if answer_key is None:
+            # The quiz is gone, so nothing can be graded; close these without a
+            # score so they stop heading every sweep in deadline order
+            result = await db.quiz_attempts.update_many(
+                {"id": {"$in": [attempt["id"] for attempt in batch]}, "submitted_at": None},
+                [{"$set": {
+                    "submitted_at": "$deadline_at",
+                    "time_taken": {"$toInt": {"$divide": [{"$subtract": ["$deadline_at", "$started_at"]}, 1000]}},
+                    "auto_submitted": True,
+                }}],
+            )
+            closed += result.modified_count
+            continue
+        graded = answer_key.grade_batch([attempt.get("answers") or {} for attempt in batch])
+        sweep_id = str(uuid.uuid4())
+        operations = []
+        submissions = []
+        for attempt, (score, theory_results) in zip(batch, graded):
+            time_taken = int((attempt["deadline_at"] - attempt["started_at"]).total_seconds())
+            operations.append(UpdateOne(
+                {"id": attempt["id"], "submitted_at": None},
+                {"$set": {
+                    "score": score,
+                    "max_score": answer_key.max_score,
+                    "submitted_at": attempt["deadline_at"],
+                    "time_taken": time_taken,
+                    "theory_results": theory_results,
+                    "grading_status": "complete",
+                    "auto_submitted": True,
+                    "auto_submit_id": sweep_id,
+                }},
+            ))
+            submissions.append((score, answer_key.max_score, time_taken))
+        result = await db.quiz_attempts.bulk_write(operations, ordered=False)
+        closed += result.modified_count
+        closed_pairs = list(zip(batch, submissions))
+        if result.modified_count < len(operations):
+            # A concurrent submit (or another worker's sweep) won the race for some
+            # attempts; count only the ones this sweep closed
+            ids = [attempt["id"] for attempt in batch]
+            ours = {doc["id"] async for doc in db.quiz_attempts.find({"id": {"$in": ids}, "auto_submit_id": sweep_id}, {"_id": 0, "id": 1})}
+            closed_pairs = [pair for pair in closed_pairs if pair[0]["id"] in ours]
+        await record_submissions(quiz_id, [submission for _, submission in closed_pairs])
+        for attempt, (score, _, _) in closed_pairs:
+            event_broker.publish(
+                "attempt_scored",
+                quiz_id=quiz_id,
+                student_id=attempt["student_id"],
+                attempt_id=attempt["id"],
+                score=score,
+                max_score=answer_key.max_score,
+                auto_submitted=True,
+            )
+    return closed
 
-@api_router.post("/quizzes/{quiz_id}/submit")
-async def submit_quiz(quiz_id: str, submission: QuizSubmission, current_user: User = Depends(get_current_user)):
+class DeadlineSweeper:
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.closed = 0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # Keep draining while full batches come back
+                while True:
+                    closed = await close_expired_attempts(limit=self.batch_size)
+                    self.closed += closed
+                    if closed < self.batch_size:
+                        break
+            except Exception:
+                logger.exception("Deadline sweep failed")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+deadline_sweeper = DeadlineSweeper(DEADLINE_SWEEP_INTERVAL_SECONDS, DEADLINE_SWEEP_BATCH_SIZE)
+
+# Autosave
+# Answer deltas are merged per attempt in memory (latest value wins) and written
+# as one unordered bulk_write per interval, or sooner once enough answers are pending.
+class AnswerAutosaveBuffer:
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: Dict[tuple, Dict[str, str]] = {}
+        self.pending_answers = 0
+        self.received = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self._task = None
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+
+    def add(self, quiz_id: str, student_id: str, answers: Dict[str, str]):
+        buffered = self.pending.setdefault((quiz_id, student_id), {})
+        before = len(buffered)
+        buffered.update(answers)
+        self.pending_answers += len(buffered) - before
+        self.received += len(answers)
+        if self.pending_answers >= self.max_pending and (self._flush_task is None or self._flush_task.done()):
+            # Hold a reference so the early flush cannot be garbage collected mid-write
+            self._flush_task = asyncio.create_task(self.flush())
+
+    def peek(self, quiz_id: str, student_id: str) -> Dict[str, str]:
+        return dict(self.pending.get((quiz_id, student_id), {}))
+
+    def discard(self, quiz_id: str, student_id: str):
+        self.pending_answers -= len(self.pending.pop((quiz_id, student_id), {}))
+
+    def requeue(self, batch: Dict[tuple, Dict[str, str]]):
+        # Answers buffered since the batch was taken are newer and win
+        for key, answers in batch.items():
+            buffered = self.pending.get(key, {})
+            merged = {**answers, **buffered}
+            self.pending[key] = merged
+            self.pending_answers += len(merged) - len(buffered)
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            batch, self.pending, self.pending_answers = self.pending, {}, 0
+            operations = [
+                UpdateOne(
+                    {"quiz_id": quiz_id, "student_id": student_id, "submitted_at": None},
+                    {"$set": {f"answers.{question_id}": answer for question_id, answer in answers.items()}},
+                )
+                for (quiz_id, student_id), answers in batch.items()
+            ]
+            keys = list(batch)
+            try:
+                await db.quiz_attempts.bulk_write(operations, ordered=False)
+                self.written += sum(len(answers) for answers in batch.values())
+                self.flushes += 1
+                return
+            except BulkWriteError as e:
+                # Unordered: everything except the reported operations was applied
+                failed = {keys[write_error["index"]] for write_error in e.details.get("writeErrors", [])}
+                logger.error(f"Autosave flush failed for {len(failed)} of {len(operations)} attempts: {e}")
+            except PyMongoError as e:
+                failed = set(keys)
+                logger.error(f"Autosave flush of {len(operations)} attempts failed, retrying next interval: {e}")
+            self.failed_flushes += 1
+            self.written += sum(len(answers) for key, answers in batch.items() if key not in failed)
+            self.requeue({key: batch[key] for key in failed})
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+        if self.pending:
+            logger.error(f"Shutting down with {self.pending_answers} autosaved answers unwritten")
+
+    def stats(self) -> dict:
+        return {
+            "pending_attempts": len(self.pending),
+            "pending_answers": self.pending_answers,
+            "received": self.received,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+        }
+
+autosave_buffer = AnswerAutosaveBuffer(AUTOSAVE_FLUSH_INTERVAL_SECONDS, AUTOSAVE_MAX_PENDING)
+
+@api_router.patch("/quizzes/{quiz_id}/answers", status_code=202)
+async def autosave_answers(quiz_id: str, delta: AnswerDelta, current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.STUDENT:
-        raise HTTPException(status_code=403, detail="Only students can submit quizzes")
+        raise HTTPException(status_code=403, detail="Only students can save answers")
+    
+    answer_key = await get_answer_key(quiz_id)
+    if answer_key is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
     
-    # Find the attempt
-    attempt = await db.quiz_attempts.find_one({"quiz_id": quiz_id, "student_id": current_user.id})
+    # Only known question ids may become field paths
+    unknown = set(delta.answers) - {question[0] for question in answer_key.questions}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown questions: {', '.join(sorted(unknown))}")
+    
+    # Buffered writes only match an open attempt; say so now instead of dropping them later
+    attempt = await db.quiz_attempts.find_one(
+        {"quiz_id": quiz_id, "student_id": current_user.id},
+        {"_id": 0, "submitted_at": 1, "deadline_at": 1},
+    )
     if not attempt:
         raise HTTPException(status_code=404, detail="Quiz attempt not found")
+    if attempt.get("submitted_at"):
+        raise HTTPException(status_code=409, detail="Quiz already submitted")
+    # Same cutoff as submit_quiz; later answers would be graded by the deadline sweep
+    if attempt.get("deadline_at") and attempt["deadline_at"] < utcnow() - timedelta(seconds=SUBMIT_GRACE_SECONDS):
+        raise HTTPException(status_code=409, detail="Time limit exceeded")
     
-    if attempt["submitted_at"]:
-        raise HTTPException(status_code=400, detail="Quiz already submitted")
+    autosave_buffer.add(quiz_id, current_user.id, delta.answers)
+    return {"buffered": len(delta.answers)}
+
+@api_router.get("/quizzes/{quiz_id}/answers")
+async def get_saved_answers(quiz_id: str, current_user: User = Depends(get_current_user)):
+    attempt = await db.quiz_attempts.find_one(
+        {"quiz_id": quiz_id, "student_id": current_user.id},
+        {"_id": 0, "answers": 1, "submitted_at": 1},
+    )
+    if not attempt:
+        raise HTTPException(status_code=404, detail="Quiz attempt not found")
+    answers = attempt.get("answers") or {}
+    if not attempt.get("submitted_at"):
+        answers.update(autosave_buffer.peek(quiz_id, current_user.id))
+    return {"answers": answers, "submitted": bool(attempt.get("submitted_at"))}
+
+@api_router.post("/quizzes/{quiz_id}/submit")
+async def submit_quiz(quiz_id: str, submission: QuizSubmission, current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.STUDENT:
+        raise HTTPException(status_code=403, detail="Only students can submit quizzes")
     
-    # Get quiz and questions
-    quiz = await db.quizzes.find_one({"id": quiz_id})
-    questions = await db.questions.find({"id": {"$in": quiz["questions"]}}).to_list(1000)
-    
-    # Calculate score
-    score = 0
-    max_score = 0
-    results = {}
-    
-    for question in questions:
-        max_score += question["points"]
-        question_id = question["id"]
-        student_answer = submission.answers.get(question_id, "")
-        correct_answer = question["correct_answer"]
-        
-        is_correct = False
-        if question["question_type"] == "objective":
-            is_correct = student_answer.strip().lower() == correct_answer.strip().lower()
-        else:  # theory questions - basic keyword matching
-            is_correct = len(student_answer.strip()) > 0  # At least attempted
-        
-        if is_correct:
-            score += question["points"]
-        
-        results[question_id] = {
-            "student_answer": student_answer,
-            "correct_answer": correct_answer,
-            "is_correct": is_correct,
-            "explanation": question["explanation"],
-            "question_text": question["question_text"]
-        }
+    answer_key = await get_answer_key(quiz_id)
+    if answer_key is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
     
-    # Update attempt
-    time_taken = int((datetime.utcnow() - datetime.fromisoformat(attempt["started_at"].replace('Z', '+00:00'))).total_seconds())
+    # Calculate score; theory answers are graded asynchronously
+    score, results = answer_key.grade(submission.answers, defer_theory=True)
+    max_score = answer_key.max_score
+    grading_status = "pending" if answer_key.theory_question_ids else "complete"
     
-    await db.quiz_attempts.update_one(
-        {"id": attempt["id"]},
+    # Close the attempt in one round-trip; the submitted_at guard makes a
+    # double submit a no-op, the deadline guard rejects late submissions and
+    # time_taken is computed by the server clock
+    cutoff = utcnow() - timedelta(seconds=SUBMIT_GRACE_SECONDS)
+    attempt = await db.quiz_attempts.find_one_and_update(
         {
+            "quiz_id": quiz_id,
+            "student_id": current_user.id,
+            "submitted_at": None,
+            "$or": [{"deadline_at": None}, {"deadline_at": {"$gte": cutoff}}],
+        },
+        [{
             "$set": {
-                "answers": submission.answers,
+                "answers": {"$literal": submission.answers},
                 "score": score,
                 "max_score": max_score,
-                "submitted_at": datetime.utcnow(),
-                "time_taken": time_taken
+                "submitted_at": "$$NOW",
+                "time_taken": {"$toInt": {"$divide": [{"$subtract": ["$$NOW", "$started_at"]}, 1000]}},
+                "grading_status": grading_status
             }
-        }
+        }],
+        projection={"_id": 0, "id": 1, "time_taken": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if attempt is None:
+        existing = await db.quiz_attempts.find_one(
+            {"quiz_id": quiz_id, "student_id": current_user.id},
+            {"_id": 0, "submitted_at": 1},
+        )
+        if not existing:
+            raise HTTPException(status_code=404, detail="Quiz attempt not found")
+        if existing.get("submitted_at"):
+            raise HTTPException(status_code=400, detail="Quiz already submitted")
+        await close_expired_attempts({"quiz_id": quiz_id, "student_id": current_user.id}, limit=1)
+        raise HTTPException(status_code=400, detail="Time limit exceeded; your saved answers were submitted")
+    
+    # The submission carries the full answer set, so pending autosaves are obsolete
+    autosave_buffer.discard(quiz_id, current_user.id)
+    time_taken = attempt["time_taken"]
+    
+    grading_job_id = None
+    if grading_status == "pending":
+        theory_answers = {question_id: submission.answers.get(question_id, "") for question_id in answer_key.theory_question_ids}
+        grading_job_id = await grading_queue.enqueue(attempt["id"], quiz_id, current_user.id, theory_answers)
+    else:
+        await record_attempt_submitted(quiz_id, score, max_score, time_taken)
+    
+    event_broker.publish(
+        "attempt_submitted",
+        quiz_id=quiz_id,
+        student_id=current_user.id,
+        attempt_id=attempt["id"],
+        score=score,
+        max_score=max_score,
+        grading_status=grading_status,
     )
+    if grading_status == "complete":
+        event_broker.publish(
+            "attempt_scored",
+            quiz_id=quiz_id,
+            student_id=current_user.id,
+            attempt_id=attempt["id"],
+            score=score,
+            max_score=max_score,
+        )
     
     return {
         "score": score,
         "max_score": max_score,
         "percentage": round((score / max_score) * 100, 2) if max_score > 0 else 0,
         "results": results,
-        "time_taken": time_taken
+        "time_taken": time_taken,
+        "grading_status": grading_status,
+        "grading_job_id": grading_job_id
     }
 
+# Background jobs
+# Jobs live in a Mongo collection and are claimed by a pool of async workers with
+# a lease, so a job held by a crashed worker is picked up again once the lease
+# expires. Subclasses implement process(); long jobs call checkpoint() to save
+# progress and extend their lease.
+class JobQueue:
+    def __init__(self, collection, workers: int, poll_interval: float, lease_seconds: int, max_tries: int):
+        self.collection = collection
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_tries = max_tries
+        self.processed = 0
+        self.failed = 0
+        self._tasks = []
+        self._wake = asyncio.Event()
+
+    async def insert(self, fields: dict) -> str:
+        now = utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            **fields,
+            "status": "queued",
+            "tries": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "lease_expires_at": None,
+        }
+        await self.collection.insert_one(job)
+        self._wake.set()
+        return job["id"]
+
+    async def claim(self) -> Optional[dict]:
+        now = utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": now}, "tries": {"$lt": self.max_tries}},
+            ]},
+            {
+                "$set": {"status": "running", "lease_expires_at": now + timedelta(seconds=self.lease_seconds), "updated_at": now},
+                "$inc": {"tries": 1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def checkpoint(self, job_id: str, **fields):
+        now = utcnow()
+        await self.collection.update_one(
+            {"id": job_id},
+            {"$set": {**fields, "updated_at": now, "lease_expires_at": now + timedelta(seconds=self.lease_seconds)}},
+        )
+
+    async def complete(self, job_id: str, **fields):
+        await self.collection.update_one(
+            {"id": job_id},
+            {"$set": {**fields, "status": "done", "updated_at": utcnow(), "lease_expires_at": None}},
+        )
+
+    async def process(self, job: dict):
+        raise NotImplementedError
+
+    async def fail(self, job: dict, error: Exception):
+        job_status = "queued" if job["tries"] < self.max_tries else "failed"
+        if job_status == "failed":
+            self.failed += 1
+        await self.collection.update_one(
+            {"id": job["id"]},
+            {"$set": {"status": job_status, "error": str(error), "updated_at": utcnow(), "lease_expires_at": None}},
+        )
+
+    async def fail_abandoned(self) -> int:
+        # Jobs whose worker died on every try; claim no longer reclaims them
+        result = await self.collection.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": utcnow()}, "tries": {"$gte": self.max_tries}},
+            {"$set": {"status": "failed", "error": "Lease expired on the last try", "updated_at": utcnow(), "lease_expires_at": None}},
+        )
+        self.failed += result.modified_count
+        return result.modified_count
+
+    async def _worker(self):
+        while True:
+            # Nothing may escape this loop: a dead task would silently shrink the pool.
+            # A job left running by an error here is reclaimed once its lease expires.
+            try:
+                job = await self.claim()
+                if job is None:
+                    await self.fail_abandoned()
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                try:
+                    await self.process(job)
+                    self.processed += 1
+                except Exception as e:
+                    logger.exception(f"Job {job['id']} in {self.collection.name} failed")
+                    await self.fail(job, e)
+            except Exception:
+                logger.exception(f"{self.collection.name} worker error, retrying in {self.poll_interval}s")
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def stats(self) -> dict:
+        counts = await self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]).to_list(None)
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "jobs": {row["_id"]: row["count"] for row in counts},
+        }
+
+# Grading queue
+# Theory answers are graded outside the request so submit latency does not
+# depend on grading cost.
+class GradingQueue(JobQueue):
+    async def enqueue(self, attempt_id: str, quiz_id: str, student_id: str, answers: Dict[str, str]) -> str:
+        return await self.insert({
+            "attempt_id": attempt_id,
+            "quiz_id": quiz_id,
+            "student_id": student_id,
+            "answers": answers,
+        })
+
+    async def process(self, job: dict):
+        answer_key = await get_answer_key(job["quiz_id"])
+        if answer_key is None:
+            raise ValueError(f"Quiz {job['quiz_id']} no longer exists")
+        theory_score, theory_results = answer_key.grade_theory(job["answers"])
+        
+        # The pending guard makes a re-run after a crash apply the score only once
+        attempt = await db.quiz_attempts.find_one_and_update(
+            {"id": job["attempt_id"], "grading_status": "pending"},
+            {
+                "$inc": {"score": theory_score},
+                "$set": {"grading_status": "complete", "theory_results": theory_results},
+            },
+            projection={"_id": 0, "score": 1, "max_score": 1, "time_taken": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if attempt is not None:
+            await record_attempt_submitted(job["quiz_id"], attempt["score"], attempt["max_score"], attempt["time_taken"])
+            event_broker.publish(
+                "attempt_scored",
+                quiz_id=job["quiz_id"],
+                student_id=job["student_id"],
+                attempt_id=job["attempt_id"],
+                score=attempt["score"],
+                max_score=attempt["max_score"],
+            )
+        
+        await self.complete(job["id"], score=theory_score)
+
+grading_queue = GradingQueue(db.grading_jobs, GRADING_WORKERS, GRADING_POLL_INTERVAL_SECONDS, GRADING_LEASE_SECONDS, GRADING_MAX_TRIES)
+
+@api_router.get("/grading/jobs/{job_id}")
+async def get_grading_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await db.grading_jobs.find_one({"id": job_id}, {"_id": 0, "answers": 0})
+    if not job or (current_user.role != UserRole.ADMIN and job["student_id"] != current_user.id):
+        raise HTTPException(status_code=404, detail="Grading job not found")
+    if job["status"] == "done":
+        attempt = await db.quiz_attempts.find_one(
+            {"id": job["attempt_id"]},
+            {"_id": 0, "score": 1, "max_score": 1, "theory_results": 1},
+        )
+        job["attempt"] = attempt
+    return job
+
+# Regrade queue
+# When a question's grading inputs change, every submitted attempt of the quizzes
+# using it is rescored against the fresh answer key. Attempts are streamed in id
+# order and written back with bulk_write; the last written id is checkpointed so
+# an interrupted job resumes where it stopped.
+REGRADE_PROJECTION = {
+    "_id": 0, "id": 1, "answers": 1, "score": 1, "max_score": 1, "time_taken": 1, "submitted_at": 1, "grading_status": 1,
+}
+
+class RegradeQueue(JobQueue):
+    async def enqueue(self, question_id: str, quiz_ids: List[str]) -> str:
+        return await self.insert({
+            "question_id": question_id,
+            "quiz_ids": quiz_ids,
+            "quiz_index": 0,
+            "last_attempt_id": None,
+            "processed": 0,
+            "total": None,
+        })
+
+    async def write_batch(self, answer_key: AnswerKey, batch: List[dict]) -> int:
+        # Each update applies only if the attempt is unchanged since it was read, so
+        # the quiz stats move by exactly the change in each attempt's contribution.
+        # Attempts changed meanwhile (usually the grading worker finishing) are
+        # read again and retried.
+        written = 0
+        increment = {}
+        while batch:
+            version = str(uuid.uuid4())
+            graded = answer_key.grade_batch([attempt.get("answers") or {} for attempt in batch])
+            operations = [
+                UpdateOne(
+                    {"id": attempt["id"], "score": attempt.get("score"), "grading_status": attempt.get("grading_status")},
+                    {"$set": {
+                        "score": score,
+                        "max_score": answer_key.max_score,
+                        "theory_results": theory_results,
+                        "grading_status": "complete",
+                        "regrade_version": version,
+                    }},
+                )
+                for attempt, (score, theory_results) in zip(batch, graded)
+            ]
+            result = await db.quiz_attempts.bulk_write(operations, ordered=False)
+            applied = list(zip(batch, graded))
+            retry = []
+            if result.matched_count < len(operations):
+                ids = [attempt["id"] for attempt in batch]
+                applied_ids = {doc["id"] async for doc in db.quiz_attempts.find({"id": {"$in": ids}, "regrade_version": version}, {"_id": 0, "id": 1})}
+                applied = [pair for pair in applied if pair[0]["id"] in applied_ids]
+                retry = [attempt_id for attempt_id in ids if attempt_id not in applied_ids]
+            for attempt, (score, _) in applied:
+                add_increment(increment, attempt_stats_contribution(attempt), sign=-1)
+                add_increment(increment, attempt_stats_contribution(
+                    {**attempt, "score": score, "max_score": answer_key.max_score, "grading_status": "complete"}
+                ))
+            written += len(applied)
+            batch = await db.quiz_attempts.find({"id": {"$in": retry}}, REGRADE_PROJECTION).to_list(None) if retry else []
+        await apply_stats_increment(answer_key.quiz_id, increment)
+        return written
+
+    async def process(self, job: dict):
+        quiz_ids = job["quiz_ids"]
+        processed = job["processed"]
+        if job["total"] is None:
+            total = await db.quiz_attempts.count_documents({"quiz_id": {"$in": quiz_ids}, "submitted_at": {"$ne": None}})
+            await self.checkpoint(job["id"], total=total)
+        
+        for quiz_index in range(job["quiz_index"], len(quiz_ids)):
+            quiz_id = quiz_ids[quiz_index]
+            answer_key = await get_answer_key(quiz_id)
+            if answer_key is not None:
+                query = {"quiz_id": quiz_id, "submitted_at": {"$ne": None}}
+                if quiz_index == job["quiz_index"] and job["last_attempt_id"]:
+                    query["id"] = {"$gt": job["last_attempt_id"]}
+                cursor = db.quiz_attempts.find(query, REGRADE_PROJECTION).sort("id", ASCENDING).batch_size(REGRADE_BATCH_SIZE)
+                batch = []
+                async for attempt in cursor:
+                    batch.append(attempt)
+                    if len(batch) >= REGRADE_BATCH_SIZE:
+                        processed += await self.write_batch(answer_key, batch)
+                        await self.checkpoint(job["id"], quiz_index=quiz_index, last_attempt_id=batch[-1]["id"], processed=processed)
+                        batch = []
+                if batch:
+                    processed += await self.write_batch(answer_key, batch)
+            await self.checkpoint(job["id"], quiz_index=quiz_index + 1, last_attempt_id=None, processed=processed)
+        
+        await self.complete(job["id"])
+
+regrade_queue = RegradeQueue(db.regrade_jobs, REGRADE_WORKERS, GRADING_POLL_INTERVAL_SECONDS, GRADING_LEASE_SECONDS, GRADING_MAX_TRIES)
+
+@api_router.get("/regrade/jobs/{job_id}")
+async def get_regrade_job(job_id: str, current_user: User = Depends(get_admin_user)):
+    job = await db.regrade_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Regrade job not found")
+    job["progress"] = round(job["processed"] / job["total"] * 100, 2) if job["total"] else None
+    return job
+
+# Live monitoring
+# Attempt lifecycle events are fanned out in-process to Server-Sent Events
+# subscribers. Each subscriber has a bounded queue; one that falls behind is
+# dropped instead of buffering without limit or slowing publishers down.
+class EventBroker:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers: Dict[int, tuple] = {}
+        self.published = 0
+        self.dropped = 0
+        self._next_id = 0
+
+    def subscribe(self, quiz_id: Optional[str] = None) -> tuple:
+        self._next_id += 1
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers[self._next_id] = (queue, quiz_id)
+        return self._next_id, queue
+
+    def unsubscribe(self, subscriber_id: int):
+        self.subscribers.pop(subscriber_id, None)
+
+    def is_subscribed(self, subscriber_id: int) -> bool:
+        return subscriber_id in self.subscribers
+
+    def publish(self, event_type: str, **data):
+        self.published += 1
+        event = {"type": event_type, "at": utcnow(), **data}
+        for subscriber_id, (queue, quiz_id) in list(self.subscribers.items()):
+            if quiz_id and quiz_id != data.get("quiz_id"):
+                continue
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.unsubscribe(subscriber_id)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped_subscribers": self.dropped,
+        }
+
+event_broker = EventBroker(EVENT_QUEUE_SIZE)
+
+# EventSource cannot send headers, so it authenticates with ?ticket= instead of
+# the bearer token. A ticket only opens the event stream and expires within a
+# minute, so the URLs that end up in access logs are useless soon after. The
+# audience claim keeps tickets from being accepted as access tokens.
+#
+# Events carry no ids and are not replayed, so there is no resuming a stream:
+# EventSource's own reconnect reuses the expired ticket, gets a 401 and closes
+# for good. Clients treat an error on the stream as the end of it, fetch a new
+# ticket from POST /monitor/events/ticket and open a new EventSource.
+EVENT_TICKET_AUDIENCE = "monitor-events"
+
+def create_event_ticket(user: User) -> str:
+    return jwt.encode(
+        {"sub": user.username, "aud": EVENT_TICKET_AUDIENCE, "exp": utcnow() + timedelta(seconds=EVENT_TICKET_TTL_SECONDS)},
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
+async def get_stream_admin(
+    ticket: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+):
+    if credentials is not None:
+        return await get_admin_user(await authenticate_token(credentials.credentials))
+    if ticket is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    try:
+        payload = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM], audience=EVENT_TICKET_AUDIENCE)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired ticket")
+    user = await load_user(payload["sub"])
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return await get_admin_user(user)
+
+async def stream_events(request: Request, subscriber_id: int, queue: asyncio.Queue):
+    try:
+        # No retry: advertised, see above; the comment only flushes the headers
+        yield ": connected\n\n"
+        while event_broker.is_subscribed(subscriber_id):
+            if await request.is_disconnected():
+                break
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {orjson.dumps(event).decode()}\n\n"
+    finally:
+        event_broker.unsubscribe(subscriber_id)
+
+@api_router.post("/monitor/events/ticket")
+async def create_monitor_ticket(current_user: User = Depends(get_admin_user)):
+    return {"ticket": create_event_ticket(current_user), "expires_in": EVENT_TICKET_TTL_SECONDS}
+
+@api_router.get("/monitor/events")
+async def monitor_events(request: Request, quiz_id: Optional[str] = None, current_user: User = Depends(get_stream_admin)):
+    subscriber_id, queue = event_broker.subscribe(quiz_id)
+    return StreamingResponse(
+        stream_events(request, subscriber_id, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Analytics Routes (Admin only)
 @api_router.get("/analytics/students")
-async def get_student_analytics(current_user: User = Depends(get_admin_user)):
+async def get_student_analytics(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    current_user: User = Depends(get_admin_user),
+):
     total_students = await db.users.count_documents({"role": "student"})
     
-    # Get recent logins (students who have taken quizzes recently)
-    recent_attempts = await db.quiz_attempts.find().sort("started_at", -1).limit(50).to_list(50)
+    match = {}
+    if cursor:
+        started_at, attempt_id = decode_cursor(cursor)
+        match = {"$or": [
+            {"started_at": {"$lt": started_at}},
+            {"started_at": started_at, "id": {"$lt": attempt_id}},
+        ]}
+    if since:
+        # A plain date range on the (started_at, id) index
+        match = {"$and": [match, {"started_at": {"$gte": as_utc(since)}}]}
+    
+    # Recent attempts joined with their student and quiz in a single round-trip
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"started_at": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {"$lookup": {"from": "users", "localField": "student_id", "foreignField": "id", "as": "student"}},
+        {"$lookup": {"from": "quizzes", "localField": "quiz_id", "foreignField": "id", "as": "quiz"}},
+        {"$project": {
+            "_id": 0,
+            "id": 1,
+            "student_name": {"$arrayElemAt": ["$student.username", 0]},
+            "quiz_title": {"$arrayElemAt": ["$quiz.title", 0]},
+            "score": 1,
+            "max_score": 1,
+            "started_at": 1,
+            "submitted_at": 1,
+        }},
+    ]
+    recent_attempts = await db.quiz_attempts.aggregate(pipeline).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(recent_attempts) > limit:
+        recent_attempts = recent_attempts[:limit]
+        last = recent_attempts[-1]
+        next_cursor = encode_cursor(last["started_at"], last["id"])
     
     students_data = []
     for attempt in recent_attempts:
-        student = await db.users.find_one({"id": attempt["student_id"]})
-        if student:
-            quiz = await db.quizzes.find_one({"id": attempt["quiz_id"]})
+        if attempt.get("student_name"):
             students_data.append({
-                "student_name": student["username"],
-                "quiz_title": quiz["title"] if quiz else "Unknown Quiz",
+                "student_name": attempt["student_name"],
+                "quiz_title": attempt.get("quiz_title") or "Unknown Quiz",
                 "score": attempt.get("score", 0),
                 "max_score": attempt.get("max_score", 0),
                 "started_at": attempt["started_at"],
@@ -406,34 +1989,293 @@ async def get_student_analytics(current_user: User = Depends(get_admin_user)):
     
     return {
         "total_students": total_students,
-        "recent_activity": students_data
+        "recent_activity": students_data,
+        "next_cursor": next_cursor
     }
 
+# Materialized per-quiz statistics
+# quiz_stats holds running counters updated with $inc on start/submit, so analytics
+# reads are O(1) per quiz regardless of how many attempts exist.
+TIME_TAKEN_BUCKETS = [60, 300, 600, 1800, 3600]  # upper bounds in seconds
+SCORE_BUCKET_COUNT = 10  # percentage score deciles
+SCORE_PERCENTILES = [25, 50, 75, 90]
+
+def score_bucket(score: int, max_score: int) -> int:
+    if not max_score:
+        return 0
+    return min(SCORE_BUCKET_COUNT - 1, int(score * SCORE_BUCKET_COUNT / max_score))
+
+def time_bucket(time_taken: int) -> int:
+    for i, upper in enumerate(TIME_TAKEN_BUCKETS):
+        if time_taken <= upper:
+            return i
+    return len(TIME_TAKEN_BUCKETS)
+
+def time_bucket_label(index: int) -> str:
+    if index < len(TIME_TAKEN_BUCKETS):
+        return f"le_{TIME_TAKEN_BUCKETS[index]}s"
+    return f"gt_{TIME_TAKEN_BUCKETS[-1]}s"
+
+def submission_stats_increment(score: int, max_score: int, time_taken: int) -> dict:
+    percentage = (score / max_score) * 100 if max_score else 0
+    return {
+        "completed_attempts": 1,
+        "score_sum": score,
+        "score_sq_sum": score * score,
+        "percentage_sum": percentage,
+        "time_taken_sum": time_taken,
+        f"score_buckets.{score_bucket(score, max_score)}": 1,
+        f"time_buckets.{time_bucket(time_taken)}": 1,
+    }
+
+async def record_attempt_started(quiz_id: str):
+    await db.quiz_stats.update_one({"quiz_id": quiz_id}, {"$inc": {"total_attempts": 1}}, upsert=True)
+
+async def record_attempt_submitted(quiz_id: str, score: int, max_score: int, time_taken: int):
+    await record_submissions(quiz_id, [(score, max_score, time_taken)])
+
+def add_increment(total: dict, increment: dict, sign: int = 1):
+    for key, value in increment.items():
+        total[key] = total.get(key, 0) + sign * value
+
+def attempt_stats_contribution(attempt: dict) -> dict:
+    # What an attempt currently adds to its quiz's stats; pending theory grading counts later
+    if not attempt.get("submitted_at") or attempt.get("score") is None or attempt.get("grading_status") == "pending":
+        return {}
+    return submission_stats_increment(attempt["score"], attempt.get("max_score") or 0, attempt.get("time_taken") or 0)
+
+async def apply_stats_increment(quiz_id: str, increment: dict):
+    increment = {key: value for key, value in increment.items() if value}
+    if increment:
+        await db.quiz_stats.update_one({"quiz_id": quiz_id}, {"$inc": increment}, upsert=True)
+
+async def record_submissions(quiz_id: str, submissions: List[tuple]):
+    # Several submissions of one quiz fold into a single $inc
+    increment = {}
+    for score, max_score, time_taken in submissions:
+        add_increment(increment, submission_stats_increment(score, max_score, time_taken))
+    await apply_stats_increment(quiz_id, increment)
+
+def estimate_percentile(buckets: dict, count: int, p: float) -> Optional[float]:
+    if count == 0:
+        return None
+    target = count * p / 100
+    width = 100 / SCORE_BUCKET_COUNT
+    seen = 0
+    for i in range(SCORE_BUCKET_COUNT):
+        in_bucket = buckets.get(str(i), 0)
+        if in_bucket and seen + in_bucket >= target:
+            # Linear interpolation inside the decile
+            return round(i * width + (target - seen) / in_bucket * width, 2)
+        seen += in_bucket
+    return 100.0
+
+def summarize_quiz_stats(stats: dict) -> dict:
+    completed = stats.get("completed_attempts", 0)
+    average = stats.get("score_sum", 0) / completed if completed else 0
+    variance = stats.get("score_sq_sum", 0) / completed - average ** 2 if completed else 0
+    score_buckets = stats.get("score_buckets", {})
+    time_buckets = stats.get("time_buckets", {})
+    return {
+        "total_attempts": stats.get("total_attempts", 0),
+        "completed_attempts": completed,
+        "average_score": round(average, 2),
+        "score_stddev": round(math.sqrt(max(variance, 0)), 2),
+        "average_percentage": round(stats.get("percentage_sum", 0) / completed, 2) if completed else 0,
+        # Interpolated within the score deciles, not exact order statistics
+        "estimated_median_percentage": estimate_percentile(score_buckets, completed, 50),
+        "estimated_percentage_percentiles": {
+            f"p{p}": estimate_percentile(score_buckets, completed, p) for p in SCORE_PERCENTILES
+        },
+        "score_histogram": {
+            f"{i * 100 // SCORE_BUCKET_COUNT}-{(i + 1) * 100 // SCORE_BUCKET_COUNT}": score_buckets.get(str(i), 0)
+            for i in range(SCORE_BUCKET_COUNT)
+        },
+        "average_time_taken": round(stats.get("time_taken_sum", 0) / completed, 2) if completed else 0,
+        "time_taken_distribution": {
+            time_bucket_label(i): time_buckets.get(str(i), 0) for i in range(len(TIME_TAKEN_BUCKETS) + 1)
+        },
+    }
+
+def quiz_stats_pipeline(quiz_ids: Optional[List[str]] = None) -> List[dict]:
+    # Server-side mirror of submission_stats_increment, so a rebuild produces the
+    # same counters as the live $inc path without streaming attempts to Python
+    max_score = {"$ifNull": ["$max_score", 0]}
+    time_taken = {"$ifNull": ["$time_taken", 0]}
+    score_bucket = {"$cond": [
+        {"$gt": [max_score, 0]},
+        {"$min": [SCORE_BUCKET_COUNT - 1, {"$floor": {"$divide": [{"$multiply": ["$score", SCORE_BUCKET_COUNT]}, max_score]}}]},
+        0,
+    ]}
+    time_bucket = {"$switch": {
+        "branches": [{"case": {"$lte": [time_taken, upper]}, "then": i} for i, upper in enumerate(TIME_TAKEN_BUCKETS)],
+        "default": len(TIME_TAKEN_BUCKETS),
+    }}
+    
+    def completed_sum(field):
+        return {"$sum": {"$cond": ["$completed", field, 0]}}
+    
+    pipeline = [{"$match": {"quiz_id": {"$in": quiz_ids}}}] if quiz_ids is not None else []
+    pipeline += [
+        {"$project": {
+            "_id": 0,
+            "quiz_id": 1,
+            # Attempts awaiting theory grading are counted by the grading worker when it finishes
+            "completed": {"$and": [
+                {"$ne": [{"$ifNull": ["$submitted_at", None]}, None]},
+                {"$ne": [{"$ifNull": ["$score", None]}, None]},
+                {"$ne": ["$grading_status", "pending"]},
+            ]},
+            "score": 1,
+            "time_taken": time_taken,
+            "percentage": {"$cond": [{"$gt": [max_score, 0]}, {"$multiply": [{"$divide": ["$score", max_score]}, 100]}, 0]},
+            "score_bucket": score_bucket,
+            "time_bucket": time_bucket,
+        }},
+        {"$group": {
+            "_id": "$quiz_id",
+            "total_attempts": {"$sum": 1},
+            "completed_attempts": completed_sum(1),
+            "score_sum": completed_sum("$score"),
+            "score_sq_sum": completed_sum({"$multiply": ["$score", "$score"]}),
+            "percentage_sum": completed_sum("$percentage"),
+            "time_taken_sum": completed_sum("$time_taken"),
+            **{f"s{i}": completed_sum({"$cond": [{"$eq": ["$score_bucket", i]}, 1, 0]}) for i in range(SCORE_BUCKET_COUNT)},
+            **{f"t{i}": completed_sum({"$cond": [{"$eq": ["$time_bucket", i]}, 1, 0]}) for i in range(len(TIME_TAKEN_BUCKETS) + 1)},
+        }},
+    ]
+    return pipeline
+
+def quiz_stats_document(row: dict) -> dict:
+    # Same shape as the documents maintained by record_submissions
+    stats = {
+        "quiz_id": row["_id"],
+        "total_attempts": row["total_attempts"],
+        "score_buckets": {str(i): row[f"s{i}"] for i in range(SCORE_BUCKET_COUNT) if row[f"s{i}"]},
+        "time_buckets": {str(i): row[f"t{i}"] for i in range(len(TIME_TAKEN_BUCKETS) + 1) if row[f"t{i}"]},
+    }
+    if row["completed_attempts"]:
+        for field in ("completed_attempts", "score_sum", "score_sq_sum", "percentage_sum", "time_taken_sum"):
+            stats[field] = row[field]
+    return stats
+
+def flatten_stats(stats: dict) -> dict:
+    # Counter fields as $inc paths, e.g. {"score_sum": 12, "score_buckets.7": 2}
+    flat = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            flat.update({f"{key}.{bucket}": count for bucket, count in value.items()})
+        elif key != "quiz_id":
+            flat[key] = value
+    return flat
+
+def stats_difference(target: dict, current: dict) -> dict:
+    difference = flatten_stats(target)
+    add_increment(difference, flatten_stats(current), sign=-1)
+    return {key: value for key, value in difference.items() if value}
+
+async def rebuild_quiz_stats(quiz_ids: Optional[List[str]] = None) -> dict:
+    # One $group over the attempts; only a row per quiz comes back. The result is
+    # applied as an $inc of its difference from a snapshot taken first, never as a
+    # replace, so increments from live submits landing meanwhile are kept. An
+    # attempt finishing while the aggregation runs may still be counted twice, so
+    # this is a repair tool for quiet periods; live paths adjust stats by delta.
+    scope = {"quiz_id": {"$in": quiz_ids}} if quiz_ids is not None else {}
+    snapshot = {stats["quiz_id"]: stats async for stats in db.quiz_stats.find(scope, {"_id": 0})}
+    rows = await db.quiz_attempts.aggregate(quiz_stats_pipeline(quiz_ids), allowDiskUse=True).to_list(None)
+    rebuilt = {stats["quiz_id"]: stats for stats in map(quiz_stats_document, rows)}
+    
+    operations = []
+    for quiz_id in set(snapshot) | set(rebuilt):
+        increment = stats_difference(rebuilt.get(quiz_id, {}), snapshot.get(quiz_id, {}))
+        if increment:
+            operations.append(UpdateOne({"quiz_id": quiz_id}, {"$inc": increment}, upsert=True))
+    if operations:
+        await db.quiz_stats.bulk_write(operations, ordered=False)
+    analytics_cache.clear()
+    return {"quizzes": len(rebuilt), "attempts": sum(stats["total_attempts"] for stats in rebuilt.values()), "adjusted": len(operations)}
+
 @api_router.get("/analytics/quizzes")
 async def get_quiz_analytics(current_user: User = Depends(get_admin_user)):
-    quizzes = await db.quizzes.find().to_list(1000)
+    cached = analytics_cache.get("quizzes")
+    if cached is not None:
+        return cached
     
-    quiz_stats = []
-    for quiz in quizzes:
-        attempts = await db.quiz_attempts.find({"quiz_id": quiz["id"]}).to_list(1000)
-        
-        total_attempts = len(attempts)
-        completed = len([a for a in attempts if a.get("submitted_at")])
-        avg_score = 0
-        
-        if completed > 0:
-            scores = [a.get("score", 0) for a in attempts if a.get("score") is not None]
-            avg_score = sum(scores) / len(scores) if scores else 0
-        
-        quiz_stats.append({
-            "quiz_title": quiz["title"],
-            "total_attempts": total_attempts,
-            "completed_attempts": completed,
-            "average_score": round(avg_score, 2)
-        })
+    quizzes = await db.quizzes.find({}, {"_id": 0, "id": 1, "title": 1}).to_list(None)
+    stats_by_quiz = {stats["quiz_id"]: stats async for stats in db.quiz_stats.find({}, {"_id": 0})}
+    
+    quiz_stats = [
+        {"quiz_id": quiz["id"], "quiz_title": quiz["title"], **summarize_quiz_stats(stats_by_quiz.get(quiz["id"], {}))}
+        for quiz in quizzes
+    ]
     
+    analytics_cache.set("quizzes", quiz_stats)
     return quiz_stats
 
+@api_router.post("/analytics/quizzes/rebuild")
+async def rebuild_quiz_analytics(current_user: User = Depends(get_admin_user)):
+    return await rebuild_quiz_stats()
+
+# Export Routes (Admin only)
+# Documents are streamed straight from a Motor cursor, so memory stays flat
+# no matter how many rows are exported.
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=CustomJSONEncoder)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def stream_export(cursor, columns: List[str], export_format: ExportFormat):
+    if export_format == ExportFormat.CSV:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        async for doc in cursor:
+            writer.writerow([csv_value(doc.get(column)) for column in columns])
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        async for doc in cursor:
+            yield orjson.dumps(doc) + b"\n"
+
+def export_response(collection, query: dict, model, name: str, export_format: ExportFormat):
+    columns = list(model.__fields__)
+    cursor = collection.find(query, {"_id": 0}).batch_size(EXPORT_BATCH_SIZE)
+    media_type = "text/csv" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(cursor, columns, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format.value}"'},
+    )
+
+@api_router.get("/export/questions")
+async def export_questions(format: ExportFormat = ExportFormat.NDJSON, current_user: User = Depends(get_admin_user)):
+    return export_response(db.questions, {}, Question, "questions", format)
+
+@api_router.get("/export/quizzes")
+async def export_quizzes(format: ExportFormat = ExportFormat.NDJSON, current_user: User = Depends(get_admin_user)):
+    return export_response(db.quizzes, {}, Quiz, "quizzes", format)
+
+@api_router.get("/export/attempts")
+async def export_attempts(
+    quiz_id: Optional[str] = None,
+    format: ExportFormat = ExportFormat.NDJSON,
+    current_user: User = Depends(get_admin_user),
+):
+    query = {"quiz_id": quiz_id} if quiz_id else {}
+    name = f"attempts-{quiz_id}" if quiz_id else "attempts"
+    return export_response(db.quiz_attempts, query, QuizAttempt, name, format)
+
 # Initialize admin user
 @api_router.post("/init-admin")
 async def init_admin():
@@ -444,13 +2286,261 @@ async def init_admin():
     admin_user = User(
         username="admin",
         email="admin@exam.com",
-        password=hash_password("admin123"),
+        password=await hash_password_async("admin123"),
         role=UserRole.ADMIN
     )
     
     await db.users.insert_one(admin_user.dict())
+    invalidate_user(admin_user.username)
     return {"message": "Admin user created", "username": "admin", "password": "admin123"}
 
+# System Routes (Admin only)
+@api_router.get("/system/password-pool")
+async def get_password_pool_stats(current_user: User = Depends(get_admin_user)):
+    return password_pool.stats()
+
+@api_router.get("/system/caches")
+async def get_cache_stats(current_user: User = Depends(get_admin_user)):
+    return {
+        "users": user_cache.stats(),
+        "analytics": analytics_cache.stats(),
+        "answer_keys": answer_key_cache.stats(),
+        "quiz_payloads": quiz_payload_cache.stats(),
+    }
+
+@api_router.get("/system/grading")
+async def get_grading_stats(current_user: User = Depends(get_admin_user)):
+    return {"grading": await grading_queue.stats(), "regrade": await regrade_queue.stats()}
+
+@api_router.get("/system/events")
+async def get_event_stats(current_user: User = Depends(get_admin_user)):
+    return event_broker.stats()
+
+@api_router.get("/system/autosave")
+async def get_autosave_stats(current_user: User = Depends(get_admin_user)):
+    return autosave_buffer.stats()
+
+@api_router.get("/system/event-loop")
+async def get_event_loop_stats(current_user: User = Depends(get_admin_user)):
+    return loop_watchdog.stats()
+
+@api_router.get("/system/profiles")
+async def get_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_admin_user),
+):
+    profiles = await db.profiles.find({}, {"_id": 0, "html": 0}).sort("created_at", DESCENDING).to_list(limit)
+    return ORJSONResponse(profiles)
+
+@api_router.get("/system/profiles/{profile_id}", response_class=HTMLResponse)
+async def get_profile(profile_id: str, current_user: User = Depends(get_admin_user)):
+    profile = await db.profiles.find_one({"id": profile_id}, {"_id": 0, "html": 1})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return HTMLResponse(profile["html"])
+
+# Index management
+# Every index a route relies on is declared here and created idempotently at
+# startup; query shapes observed by the command listener are checked against
+# the indexes that actually exist.
+INDEXES = {
+    "users": [
+        ([("username", ASCENDING)], {"unique": True}),
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("role", ASCENDING)], {}),
+    ],
+    "questions": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("created_at", ASCENDING), ("id", ASCENDING)], {}),
+    ],
+    "quizzes": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("is_active", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], {}),
+        ([("questions", ASCENDING)], {}),
+    ],
+    "quiz_stats": [
+        ([("quiz_id", ASCENDING)], {"unique": True}),
+    ],
+    "grading_jobs": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("status", ASCENDING), ("created_at", ASCENDING)], {}),
+    ],
+    "regrade_jobs": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("status", ASCENDING), ("created_at", ASCENDING)], {}),
+    ],
+    "profiles": [
+        ([("id", ASCENDING)], {"unique": True}),
+        # Stored profiles expire on their own
+        ([("created_at", ASCENDING)], {"expireAfterSeconds": PROFILE_RETENTION_SECONDS}),
+    ],
+    "quiz_attempts": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("quiz_id", ASCENDING), ("student_id", ASCENDING)], {"unique": True}),
+        ([("quiz_id", ASCENDING), ("id", ASCENDING)], {}),
+        # Open attempts ordered by deadline for the deadline sweeper
+        ([("submitted_at", ASCENDING), ("deadline_at", ASCENDING)], {}),
+        ([("started_at", DESCENDING), ("id", DESCENDING)], {}),
+    ],
+}
+
+async def load_index_keys(collections) -> Dict[str, List[list]]:
+    indexes = {}
+    for collection in collections:
+        info = await db[collection].index_information()
+        indexes[collection] = [spec["key"] for spec in info.values()]
+    query_shapes.indexes.update(indexes)
+    return indexes
+
+async def uncovered_query_shapes() -> List[dict]:
+    shapes = query_shapes.snapshot()
+    indexes = await load_index_keys({shape["collection"] for shape in shapes})
+    uncovered = [
+        shape for shape in shapes
+        if not any(index_covers(keys, shape) for keys in indexes[shape["collection"]])
+    ]
+    return sorted(uncovered, key=lambda shape: shape["count"], reverse=True)
+
+async def ensure_indexes() -> dict:
+    report = {"created": [], "failed": []}
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                name = await db[collection].create_index(keys, **options)
+                report["created"].append(f"{collection}.{name}")
+            except PyMongoError as e:
+                # Usually pre-existing duplicates blocking a unique index
+                logger.error(f"Could not create index {keys} on {collection}: {e}")
+                report["failed"].append({"collection": collection, "keys": keys, "error": str(e)})
+    # From here on, the first query of each new shape without an index is logged
+    await load_index_keys(INDEXES)
+    return report
+
+@api_router.get("/system/indexes")
+async def get_index_report(current_user: User = Depends(get_admin_user)):
+    existing = {}
+    for collection in INDEXES:
+        info = await db[collection].index_information()
+        existing[collection] = {name: spec["key"] for name, spec in info.items()}
+    return {
+        "existing": existing,
+        "observed_shapes": len(query_shapes.shapes),
+        "dropped_shapes": query_shapes.dropped,
+        "uncovered": await uncovered_query_shapes(),
+    }
+
+# Exposes the in-process counters (pools, caches, buffers) at scrape time
+class AppStatsCollector:
+    def collect(self):
+        pool = password_pool.stats()
+        yield GaugeMetricFamily("password_pool_in_flight", "Password hashes running or queued", value=pool["in_flight"])
+        yield GaugeMetricFamily("password_pool_queued", "Password hashes waiting for a worker", value=pool["queued"])
+        yield CounterMetricFamily("password_pool_rejected", "Password requests rejected with 429", value=pool["rejected"])
+        
+        caches = [
+            ("users", user_cache),
+            ("analytics", analytics_cache),
+            ("answer_keys", answer_key_cache),
+            ("quiz_payloads", quiz_payload_cache),
+        ]
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Cached entries", labels=["cache"])
+        for name, cache in caches:
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            size.add_metric([name], stats["size"])
+        yield hits
+        yield misses
+        yield size
+        
+        autosave = autosave_buffer.stats()
+        yield GaugeMetricFamily("autosave_pending_answers", "Answers buffered for the next flush", value=autosave["pending_answers"])
+        yield CounterMetricFamily("autosave_written_answers", "Answers flushed to MongoDB", value=autosave["written"])
+        yield GaugeMetricFamily("event_subscribers", "Connected live monitor streams", value=len(event_broker.subscribers))
+        yield CounterMetricFamily("deadline_auto_submitted", "Attempts closed by the deadline sweeper", value=deadline_sweeper.closed)
+
+REGISTRY.register(AppStatsCollector())
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template so path parameters don't explode cardinality
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(status_code),
+        ).observe(time.perf_counter() - started)
+
+SENSITIVE_QUERY_PARAMS = {"token", "ticket"}
+
+def redact_query(query: str) -> str:
+    params = [(key, "[redacted]" if key in SENSITIVE_QUERY_PARAMS else value) for key, value in parse_qsl(query, keep_blank_values=True)]
+    return urlencode(params, safe="[]")
+
+# Admin-triggered sampling profiler; the rendered flame graph is stored in
+# Mongo so any worker can serve it, and its id is returned in X-Profile-Id.
+async def profiling_admin(request: Request) -> Optional[User]:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        user = await authenticate_token(token)
+    except HTTPException:
+        return None
+    return user if user.role == UserRole.ADMIN else None
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if request.headers.get("X-Profile") != "1" and request.query_params.get("profile") != "1":
+        return await call_next(request)
+    user = await profiling_admin(request)
+    if user is None:
+        return await call_next(request)
+    
+    # async_mode keeps time spent awaiting attributed to this request only
+    profiler = Profiler(interval=PROFILE_SAMPLE_INTERVAL_SECONDS, async_mode="enabled")
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    duration = time.perf_counter() - started
+    
+    profile_id = str(uuid.uuid4())
+    html = await asyncio.get_running_loop().run_in_executor(None, profiler.output_html)
+    try:
+        await db.profiles.insert_one({
+            "id": profile_id,
+            "method": request.method,
+            "path": request.url.path,
+            "query": redact_query(request.url.query),
+            "status": response.status_code,
+            "duration_seconds": round(duration, 4),
+            "created_by": user.username,
+            "created_at": utcnow(),
+            "html": html,
+        })
+    except PyMongoError as e:
+        logger.error(f"Failed to store profile for {request.url.path}: {e}")
+        return response
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -460,6 +2550,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Profile-Id"],
 )
 
 # Configure logging
@@ -469,6 +2560,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_db_indexes():
+    await ensure_indexes()
+
+@app.on_event("startup")
+async def start_background_tasks():
+    autosave_buffer.start()
+    grading_queue.start()
+    regrade_queue.start()
+    deadline_sweeper.start()
+    if LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    grading_queue.stop()
+    regrade_queue.stop()
+    deadline_sweeper.stop()
+    loop_watchdog.stop()
+    await autosave_buffer.stop()
     client.close()
+    password_pool.shutdown()
+
+# Converts timestamps written as ISO strings by older builds into BSON dates
+TIMESTAMP_FIELDS = {
+    "users": ["created_at"],
+    "questions": ["created_at"],
+    "quizzes": ["created_at"],
+    "quiz_attempts": ["started_at", "deadline_at", "submitted_at"],
+}
+
+async def migrate_timestamps() -> dict:
+    converted = {}
+    for collection, fields in TIMESTAMP_FIELDS.items():
+        for field in fields:
+            result = await db[collection].update_many(
+                {field: {"$type": "string"}},
+                [{"$set": {field: {"$toDate": f"${field}"}}}],
+            )
+            converted[f"{collection}.{field}"] = result.modified_count
+    return converted
+
+# Maintenance commands: python server.py rebuild-quiz-stats | migrate-timestamps
+if __name__ == "__main__":
+    commands = {"rebuild-quiz-stats": rebuild_quiz_stats, "migrate-timestamps": migrate_timestamps}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        sys.exit(f"usage: python server.py [{'|'.join(commands)}]")
+    print(asyncio.run(commands[sys.argv[1]]()))
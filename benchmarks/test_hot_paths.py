@@ -0,0 +1,171 @@
+"""Micro-benchmarks for the request hot paths in backend/server.py.
+
+Runs with pytest-benchmark against synthetic quizzes of 10, 100 and 1,000
+questions. Tests in the same group measure alternatives side by side (compiled
+rubric vs a naive keyword scan, orjson vs validated models). Save a run and
+compare later runs against it to catch regressions before deploying:
+
+    pytest benchmarks/test_hot_paths.py --benchmark-autosave
+    pytest benchmarks/test_hot_paths.py --benchmark-compare --benchmark-compare-fail=mean:20%
+"""
+import asyncio
+import json
+import random
+import uuid
+
+import jwt
+import orjson
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from backend import server
+
+QUIZ_SIZES = [10, 100, 1000]
+RUBRIC_SIZES = [5, 50, 500]
+RUBRIC_BATCH_SIZE = 1000
+ANSWER_WORDS = 80
+VOCABULARY = [f"term{i}" for i in range(5000)]
+
+def make_questions(count):
+    questions = []
+    for i in range(count):
+        theory = i % 5 == 4
+        questions.append({
+            "id": str(uuid.uuid4()),
+            "question_text": f"Question {i}",
+            "question_type": "theory" if theory else "objective",
+            "options": None if theory else ["alpha", "beta", "gamma", "delta"],
+            "correct_answer": "kinetic energy is converted to heat by friction" if theory else "Beta",
+            "explanation": "Synthetic question",
+            "points": 2 if theory else 1,
+            "rubric": None,
+            "created_by": "admin",
+            "created_at": server.utcnow(),
+        })
+    return questions
+
+def make_quiz(questions):
+    return {
+        "id": str(uuid.uuid4()),
+        "title": "Benchmark quiz",
+        "description": "Synthetic",
+        "questions": [question["id"] for question in questions],
+        "time_limit": 60,
+        "created_by": "admin",
+        "created_at": server.utcnow(),
+        "is_active": True,
+    }
+
+def make_answers(questions):
+    return {
+        question["id"]: "friction turns kinetic energy into heat" if question["question_type"] == "theory" else " beta "
+        for question in questions
+    }
+
+def make_rubric(size):
+    items = []
+    for i in range(size):
+        # Mix single keywords with two-word phrases and synonyms
+        keywords = [VOCABULARY[i * 3]]
+        if i % 3 == 0:
+            keywords.append(f"{VOCABULARY[i * 3 + 1]} {VOCABULARY[i * 3 + 2]}")
+        items.append({"keywords": keywords, "weight": 1.0 + (i % 4)})
+    return items
+
+def naive_score(rubric, answer):
+    text = answer.lower()
+    total = sum(item["weight"] for item in rubric)
+    matched = sum(item["weight"] for item in rubric if any(k.lower() in text for k in item["keywords"]))
+    return matched / total
+
+@pytest.fixture(params=QUIZ_SIZES, ids=lambda size: f"{size}q")
+def quiz_questions(request):
+    return make_questions(request.param)
+
+@pytest.fixture(params=RUBRIC_SIZES, ids=lambda size: f"{size}kw")
+def rubric(request):
+    return make_rubric(request.param)
+
+@pytest.fixture(scope="module")
+def rubric_answers():
+    rng = random.Random(42)
+    return [" ".join(rng.choices(VOCABULARY[:1500], k=ANSWER_WORDS)) for _ in range(RUBRIC_BATCH_SIZE)]
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest.fixture
+def student_token():
+    user = {"username": "bench_student", "id": str(uuid.uuid4()), "role": "student"}
+    server.user_cache.set(user["username"], server.User(**user, email="bench@example.com", password="x"))
+    yield server.create_access_token(server.token_claims_for(user))
+    server.user_cache.invalidate(user["username"])
+
+# Grading (submit_quiz)
+def test_compile_answer_key(benchmark, quiz_questions):
+    quiz = make_quiz(quiz_questions)
+    benchmark(server.AnswerKey, quiz, quiz_questions)
+
+def test_grade_submission(benchmark, quiz_questions):
+    answer_key = server.AnswerKey(make_quiz(quiz_questions), quiz_questions)
+    answers = make_answers(quiz_questions)
+    score, _ = benchmark(answer_key.grade, answers, defer_theory=True)
+    assert score > 0
+
+def test_grade_theory(benchmark, quiz_questions):
+    answer_key = server.AnswerKey(make_quiz(quiz_questions), quiz_questions)
+    answers = make_answers(quiz_questions)
+    benchmark(answer_key.grade_theory, answers)
+
+# Theory rubrics (grading and regrade workers), scoring a batch of 1,000 answers
+def test_compile_rubric(benchmark, rubric):
+    benchmark(server.CompiledRubric.from_question, {"rubric": rubric, "correct_answer": ""})
+
+@pytest.mark.benchmark(group="rubric-scoring")
+def test_rubric_score_batch(benchmark, rubric, rubric_answers):
+    compiled = server.CompiledRubric.from_question({"rubric": rubric, "correct_answer": ""})
+    benchmark(compiled.score_batch, rubric_answers)
+
+@pytest.mark.benchmark(group="rubric-scoring")
+def test_rubric_naive_scan(benchmark, rubric, rubric_answers):
+    benchmark(lambda: [naive_score(rubric, answer) for answer in rubric_answers])
+
+# Tokens (login, get_current_user)
+def test_create_access_token(benchmark):
+    claims = {"sub": "bench_student", "uid": str(uuid.uuid4()), "role": "student"}
+    benchmark(server.create_access_token, claims)
+
+def test_decode_token(benchmark, student_token):
+    benchmark(jwt.decode, student_token, server.SECRET_KEY, algorithms=[server.ALGORITHM])
+
+def test_authenticate_cached_user(benchmark, loop, student_token, monkeypatch):
+    monkeypatch.setattr(server, "AUTH_TRUST_TOKEN_CLAIMS", False)
+    user = benchmark(lambda: loop.run_until_complete(server.authenticate_token(student_token)))
+    assert user.username == "bench_student"
+
+def test_authenticate_trusted_claims(benchmark, loop, student_token, monkeypatch):
+    monkeypatch.setattr(server, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    user = benchmark(lambda: loop.run_until_complete(server.authenticate_token(student_token)))
+    assert user.role == server.UserRole.STUDENT
+
+# Serialization (get_questions, get_quiz)
+def test_question_models(benchmark, quiz_questions):
+    benchmark(lambda: [server.Question(**question) for question in quiz_questions])
+
+# The read path before orjson: validate a model per document, then encode the response_model list
+@pytest.mark.benchmark(group="question-list")
+def test_question_validated_json(benchmark, quiz_questions):
+    benchmark(lambda: json.dumps(jsonable_encoder([server.Question(**question) for question in quiz_questions])).encode("utf-8"))
+
+@pytest.mark.benchmark(group="question-list")
+def test_question_orjson(benchmark, quiz_questions):
+    benchmark(orjson.dumps, quiz_questions)
+
+def test_student_quiz_payload(benchmark, quiz_questions):
+    quiz = make_quiz(quiz_questions)
+    benchmark(
+        lambda: server.build_quiz_payload(dict(quiz), [dict(question) for question in quiz_questions], server.UserRole.STUDENT)
+    )
@@ -0,0 +1,9 @@
+"""Shared pytest setup for tests/ and benchmarks/.
+
+Importing backend.server builds the Motor client at import time; these defaults
+let it import without a backend/.env. No test here talks to MongoDB.
+"""
+import os
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
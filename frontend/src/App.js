@@ -477,9 +477,10 @@ function TakeQuiz({ setCurrentView }) {
               <div className="flex items-start justify-between mb-4">
                 <h4 className="text-lg font-semibold">Question {index + 1}</h4>
                 <span className={`px-3 py-1 rounded text-sm ${
+                  questionResult.is_correct === null ? 'bg-yellow-100 text-yellow-800' :
                   questionResult.is_correct ? 'bg-green-100 text-green-800' : 'bg-red-100 text-red-800'
                 }`}>
-                  {questionResult.is_correct ? 'Correct' : 'Incorrect'}
+                  {questionResult.is_correct === null ? 'Pending Review' : questionResult.is_correct ? 'Correct' : 'Incorrect'}
                 </span>
               </div>
               
@@ -493,7 +494,7 @@ function TakeQuiz({ setCurrentView }) {
                   </span>
                 </div>
                 
-                {!questionResult.is_correct && (
+                {questionResult.is_correct === false && (
                   <div>
                     <span className="font-semibold">Correct Answer: </span>
                     <span className="text-green-600">{questionResult.correct_answer}</span>
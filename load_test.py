@@ -0,0 +1,349 @@
+"""Concurrent exam-day load test for the backend API.
+
+Unlike backend_test.py, which checks endpoints one request at a time, this
+drives many simulated users at once with asyncio + httpx:
+
+  * login storm      - every student logs in at the same moment
+  * exam             - every student opens the quiz, starts it, autosaves and submits
+  * admin polling    - admins poll the analytics endpoints while the exam runs
+
+It reports p50/p95/p99 latency and throughput per endpoint and exits non-zero
+when a result regresses past the stored baseline.
+
+By default a throwaway stack is started: a local mongod on a temporary dbpath
+(the real server, so aggregations and update pipelines behave as in
+production) plus uvicorn serving backend.server. Pass --mongo-url to reuse a
+running MongoDB or --base-url to target an already running API.
+
+    python load_test.py --students 300
+    python load_test.py --update-baseline      # record the current numbers
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_BASELINE = ROOT_DIR / "load_test_baseline.json"
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+class LocalStack:
+    """Throwaway mongod + uvicorn for a single run"""
+
+    def __init__(self, mongo_url=None):
+        self.mongo_url = mongo_url
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.processes = []
+        self.dbpath = None
+
+    def start(self):
+        if self.mongo_url is None:
+            mongod = shutil.which("mongod")
+            if mongod is None:
+                sys.exit("mongod not found on PATH; pass --mongo-url or --base-url")
+            mongo_port = free_port()
+            self.dbpath = tempfile.mkdtemp(prefix="loadtest-mongo-")
+            self.processes.append(subprocess.Popen(
+                [mongod, "--dbpath", self.dbpath, "--port", str(mongo_port), "--bind_ip", "127.0.0.1", "--quiet"],
+                stdout=subprocess.DEVNULL,
+            ))
+            if not wait_for_port(mongo_port):
+                self.stop()
+                sys.exit("mongod did not start")
+            self.mongo_url = f"mongodb://127.0.0.1:{mongo_port}"
+
+        env = {**os.environ, "MONGO_URL": self.mongo_url, "DB_NAME": f"loadtest_{uuid.uuid4().hex[:8]}"}
+        self.processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.server:app", "--port", str(self.port), "--workers", "1", "--log-level", "warning"],
+            cwd=ROOT_DIR,
+            env=env,
+        ))
+        if not wait_for_port(self.port):
+            self.stop()
+            sys.exit("uvicorn did not start")
+
+    def stop(self):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.dbpath:
+            shutil.rmtree(self.dbpath, ignore_errors=True)
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.first_start = {}
+        self.last_end = {}
+
+    async def request(self, client, method, label, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response = None
+            status = "error"
+        ended = time.perf_counter()
+        self.latencies[label].append((ended - started) * 1000)
+        self.statuses[label][status] += 1
+        self.first_start.setdefault(label, started)
+        self.last_end[label] = ended
+        return response
+
+    def report(self):
+        report = {}
+        for label, samples in self.latencies.items():
+            samples = sorted(samples)
+            statuses = self.statuses[label]
+            window = self.last_end[label] - self.first_start[label]
+            report[label] = {
+                "count": len(samples),
+                "errors": sum(count for status, count in statuses.items() if status == "error" or status >= 400 and status != 429),
+                "rejected": statuses.get(429, 0),
+                "p50": round(percentile(samples, 50), 2),
+                "p95": round(percentile(samples, 95), 2),
+                "p99": round(percentile(samples, 99), 2),
+                "rps": round(len(samples) / window, 2) if window > 0 else None,
+            }
+        return report
+
+class ExamDayLoadTest:
+    def __init__(self, base_url, students, questions, admins, concurrency):
+        self.base_url = base_url
+        self.students = students
+        self.questions = questions
+        self.admins = admins
+        self.recorder = Recorder()
+        self.limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.admin_token = None
+        self.quiz_id = None
+        self.question_ids = []
+        self.student_names = [f"load_{uuid.uuid4().hex[:6]}_{i}" for i in range(students)]
+        self.student_tokens = {}
+
+    async def call(self, client, method, label, url, token=None, **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        async with self.semaphore:
+            return await self.recorder.request(client, method, label, url, headers=headers, **kwargs)
+
+    async def call_until_accepted(self, client, method, label, url, token=None, attempts=20, **kwargs):
+        # The password pool sheds load with 429; wait as told and try again so
+        # no simulated user silently drops out. Each rejection is still recorded.
+        for _ in range(attempts):
+            response = await self.call(client, method, label, url, token=token, **kwargs)
+            if response is None or response.status_code != 429:
+                return response
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+        return response
+
+    async def setup(self, client):
+        await self.call(client, "POST", "POST /api/init-admin", "/api/init-admin")
+        response = await self.call(client, "POST", "POST /api/login", "/api/login", json={"username": "admin", "password": "admin123"})
+        if response is None or response.status_code != 200:
+            sys.exit("Could not log in as admin")
+        self.admin_token = response.json()["access_token"]
+
+        questions = []
+        for i in range(self.questions):
+            if i % 5 == 4:
+                questions.append({
+                    "question_text": f"Explain concept {i}",
+                    "question_type": "theory",
+                    "correct_answer": "energy is conserved in a closed system",
+                    "explanation": "Conservation of energy",
+                    "points": 2,
+                })
+            else:
+                questions.append({
+                    "question_text": f"Pick the right option for {i}",
+                    "question_type": "objective",
+                    "options": ["a", "b", "c", "d"],
+                    "correct_answer": "b",
+                    "explanation": "b is correct",
+                })
+        response = await self.call(client, "POST", "POST /api/questions/bulk", "/api/questions/bulk", token=self.admin_token, json=questions)
+        if response is None or response.status_code != 200 or response.json()["failed"]:
+            sys.exit("Could not create the load test questions")
+        # Bulk ids come back in input order, so i % 5 still tells theory from objective
+        self.question_ids = response.json()["ids"]
+
+        response = await self.call(client, "POST", "POST /api/quizzes", "/api/quizzes", token=self.admin_token, json={
+            "title": "Load test exam",
+            "description": "Generated by load_test.py",
+            "questions": self.question_ids,
+            "time_limit": 60,
+        })
+        self.quiz_id = response.json()["id"]
+
+        responses = await asyncio.gather(*[
+            self.call_until_accepted(client, "POST", "POST /api/register", "/api/register", json={
+                "username": name,
+                "email": f"{name}@load.test",
+                "password": "password123",
+                "role": "student",
+            })
+            for name in self.student_names
+        ])
+        failed = sum(1 for response in responses if response is None or response.status_code != 200)
+        if failed:
+            sys.exit(f"Could not register {failed} of {self.students} students")
+
+    async def login_storm(self, client):
+        async def login(name):
+            response = await self.call_until_accepted(client, "POST", "POST /api/login", "/api/login",
+                                                      json={"username": name, "password": "password123"})
+            if response is not None and response.status_code == 200:
+                self.student_tokens[name] = response.json()["access_token"]
+        await asyncio.gather(*[login(name) for name in self.student_names])
+        missing = self.students - len(self.student_tokens)
+        if missing:
+            sys.exit(f"{missing} of {self.students} students could not log in; the exam phase would run short")
+
+    async def take_exam(self, client, token):
+        quiz_url = f"/api/quizzes/{self.quiz_id}"
+        await self.call(client, "GET", "GET /api/quizzes/{quiz_id}", quiz_url, token=token)
+        await self.call(client, "POST", "POST /api/quizzes/{quiz_id}/start", f"{quiz_url}/start", token=token)
+        answers = {
+            question_id: "b" if i % 5 != 4 else "energy is conserved because the system is closed"
+            for i, question_id in enumerate(self.question_ids)
+        }
+        half = len(self.question_ids) // 2
+        for chunk in (self.question_ids[:half], self.question_ids[half:]):
+            await self.call(client, "PATCH", "PATCH /api/quizzes/{quiz_id}/answers", f"{quiz_url}/answers", token=token,
+                            json={"answers": {question_id: answers[question_id] for question_id in chunk}})
+        await self.call(client, "POST", "POST /api/quizzes/{quiz_id}/submit", f"{quiz_url}/submit", token=token,
+                        json={"quiz_id": self.quiz_id, "answers": answers})
+
+    async def poll_analytics(self, client, stop):
+        while not stop.is_set():
+            await self.call(client, "GET", "GET /api/analytics/students", "/api/analytics/students", token=self.admin_token)
+            await self.call(client, "GET", "GET /api/analytics/quizzes", "/api/analytics/quizzes", token=self.admin_token)
+            await asyncio.sleep(0.5)
+
+    async def run(self):
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=60, limits=self.limits) as client:
+            print(f"🔧 Setting up {self.questions} questions and {self.students} students...")
+            await self.setup(client)
+            # Setup requests are not part of the measured scenarios
+            self.recorder = Recorder()
+
+            print("🔍 Login storm...")
+            await self.login_storm(client)
+
+            print("🔍 Exam with concurrent admin polling...")
+            stop = asyncio.Event()
+            pollers = [asyncio.create_task(self.poll_analytics(client, stop)) for _ in range(self.admins)]
+            await asyncio.gather(*[self.take_exam(client, token) for token in self.student_tokens.values()])
+            stop.set()
+            await asyncio.gather(*pollers)
+        return self.recorder.report()
+
+def print_report(report):
+    print(f"\n{'endpoint':<42} {'count':>6} {'err':>4} {'429':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for label in sorted(report):
+        row = report[label]
+        print(f"{label:<42} {row['count']:>6} {row['errors']:>4} {row['rejected']:>4} "
+              f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} {row['rps'] or 0:>8.1f}")
+
+def compare_to_baseline(report, baseline, tolerance):
+    failures = []
+    for label, expected in baseline.items():
+        actual = report.get(label)
+        if actual is None:
+            continue
+        if actual["p95"] > expected["p95"] * (1 + tolerance):
+            failures.append(f"{label}: p95 {actual['p95']}ms > baseline {expected['p95']}ms")
+        if expected.get("rps") and actual["rps"] is not None and actual["rps"] < expected["rps"] * (1 - tolerance):
+            failures.append(f"{label}: throughput {actual['rps']}/s < baseline {expected['rps']}/s")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Target a running API instead of starting a local stack")
+    parser.add_argument("--mongo-url", help="Use this MongoDB for the local stack instead of a throwaway mongod")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--admins", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", type=Path, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    stack = None
+    base_url = args.base_url
+    if base_url is None:
+        stack = LocalStack(args.mongo_url)
+        stack.start()
+        base_url = stack.base_url
+
+    try:
+        test = ExamDayLoadTest(base_url, args.students, args.questions, args.admins, args.concurrency)
+        report = asyncio.run(test.run())
+    finally:
+        if stack:
+            stack.stop()
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"\n📝 Baseline written to {args.baseline}")
+        return 0
+
+    failures = [f"{label}: {row['errors']} failed requests" for label, row in report.items() if row["errors"]]
+    if args.baseline.exists():
+        failures += compare_to_baseline(report, json.loads(args.baseline.read_text()), args.tolerance)
+    else:
+        print(f"\nℹ️  No baseline at {args.baseline}; run with --update-baseline to record one")
+
+    if failures:
+        print("\n❌ Load test failed:")
+        for failure in failures:
+            print(f"   {failure}")
+        return 1
+    print("\n✅ Load test passed")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Buffered answer autosaves: merging, flushing and requeueing failed writes."""
+import asyncio
+import types
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from backend import server
+
+class StubAttempts:
+    def __init__(self, buffer, error=None, during_write=None):
+        self.buffer = buffer
+        self.error = error
+        self.during_write = during_write
+        self.writes = []
+
+    async def bulk_write(self, operations, ordered):
+        # Answers arriving while the write is in flight land in the fresh buffer
+        if self.during_write:
+            self.during_write(self.buffer)
+        self.writes.append([(operation._filter["student_id"], operation._doc["$set"]) for operation in operations])
+        if self.error:
+            raise self.error
+
+def flush(buffer, monkeypatch, **stub):
+    attempts = StubAttempts(buffer, **stub)
+    monkeypatch.setattr(server, "db", types.SimpleNamespace(quiz_attempts=attempts))
+    asyncio.run(buffer.flush())
+    return attempts
+
+def pending_count(buffer):
+    return sum(len(answers) for answers in buffer.pending.values())
+
+def make_buffer():
+    buffer = server.AnswerAutosaveBuffer(flush_interval=60, max_pending=100)
+    buffer.add("q1", "s1", {"a": "1", "b": "1"})
+    buffer.add("q1", "s2", {"a": "2"})
+    buffer.add("q1", "s1", {"a": "3"})
+    return buffer
+
+def test_add_merges_answers_per_attempt():
+    buffer = make_buffer()
+    assert buffer.peek("q1", "s1") == {"a": "3", "b": "1"}
+    assert buffer.pending_answers == pending_count(buffer) == 3
+    assert buffer.received == 4
+
+def test_flush_writes_one_update_per_attempt(monkeypatch):
+    buffer = make_buffer()
+    attempts = flush(buffer, monkeypatch)
+    assert attempts.writes == [[("s1", {"answers.a": "3", "answers.b": "1"}), ("s2", {"answers.a": "2"})]]
+    assert (buffer.pending, buffer.pending_answers, buffer.written, buffer.flushes) == ({}, 0, 3, 1)
+
+def test_failed_flush_requeues_everything_and_newer_answers_win(monkeypatch):
+    buffer = make_buffer()
+
+    def student_keeps_answering(buffer):
+        buffer.add("q1", "s1", {"b": "4", "c": "4"})
+
+    flush(buffer, monkeypatch, error=AutoReconnect("primary stepped down"), during_write=student_keeps_answering)
+    assert buffer.peek("q1", "s1") == {"a": "3", "b": "4", "c": "4"}
+    assert buffer.peek("q1", "s2") == {"a": "2"}
+    assert buffer.pending_answers == pending_count(buffer) == 4
+    assert (buffer.written, buffer.failed_flushes) == (0, 1)
+
+def test_bulk_write_error_requeues_only_the_failed_attempts(monkeypatch):
+    buffer = make_buffer()
+    error = BulkWriteError({"writeErrors": [{"index": 1, "code": 2, "errmsg": "bad path"}]})
+
+    def student_keeps_answering(buffer):
+        buffer.add("q1", "s2", {"a": "5"})
+
+    flush(buffer, monkeypatch, error=error, during_write=student_keeps_answering)
+    assert buffer.pending == {("q1", "s2"): {"a": "5"}}
+    assert buffer.pending_answers == pending_count(buffer) == 1
+    assert (buffer.written, buffer.failed_flushes) == (2, 1)
+
+def test_requeued_answers_are_written_by_the_next_flush(monkeypatch):
+    buffer = make_buffer()
+    flush(buffer, monkeypatch, error=AutoReconnect("primary stepped down"))
+    attempts = flush(buffer, monkeypatch)
+    # Requeued attempts come back in no particular order
+    assert [sorted(write) for write in attempts.writes] == [[("s1", {"answers.a": "3", "answers.b": "1"}), ("s2", {"answers.a": "2"})]]
+    assert (buffer.pending_answers, buffer.written, buffer.flushes) == (0, 3, 1)
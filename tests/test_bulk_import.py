@@ -0,0 +1,96 @@
+"""Parsing of bulk question imports (JSON array, NDJSON and CSV)."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Request
+
+from backend import server
+
+def make_request(body: bytes, content_type: str, chunk_size: int = 7) -> Request:
+    # Deliver the body in small chunks so lines straddle chunk boundaries
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)]
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {"type": "http", "method": "POST", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+def parse(body: bytes, content_type: str) -> list:
+    async def collect():
+        return [item async for item in server.iter_bulk_items(make_request(body, content_type))]
+    return asyncio.run(collect())
+
+def test_csv_item_options_and_points():
+    header = ["question_text", "question_type", "options", "correct_answer", "points"]
+    assert server.csv_question_item(header, 'Pick one,objective,a|b|c,b,3') == {
+        "question_text": "Pick one",
+        "question_type": "objective",
+        "options": ["a", "b", "c"],
+        "correct_answer": "b",
+        "points": 3,
+    }
+    item = server.csv_question_item(header, 'Pick one,objective,"[""x, y"", ""z""]",z,')
+    assert item["options"] == ["x, y", "z"]
+    assert "points" not in item
+    assert server.csv_question_item(header, "Explain,theory,,because,")["options"] is None
+
+def test_csv_item_rejects_bad_points():
+    with pytest.raises(ValueError):
+        server.csv_question_item(["question_text", "points"], "Q,many")
+
+def test_json_array():
+    items = parse(b'[{"question_text": "a"}, {"question_text": "b"}]', "application/json")
+    assert items == [(0, {"question_text": "a"}, None), (1, {"question_text": "b"}, None)]
+
+@pytest.mark.parametrize("body", [b"[{bad", b'{"question_text": "a"}'])
+def test_json_body_must_be_an_array(body):
+    with pytest.raises(HTTPException) as excinfo:
+        parse(body, "application/json")
+    assert excinfo.value.status_code == 400
+
+def test_ndjson_reports_bad_lines_and_skips_blank_ones():
+    items = parse(b'{"question_text": "a"}\n\n{bad\n{"question_text": "c"}', "application/x-ndjson")
+    assert [(index, item) for index, item, _ in items] == [(0, {"question_text": "a"}), (1, None), (2, {"question_text": "c"})]
+    assert items[1][2].startswith("Invalid JSON")
+
+def test_csv_body():
+    body = b"question_text,question_type,options,correct_answer\nPick,objective,a|b,a\n\nExplain,theory,,because\n"
+    items = parse(body, "text/csv; charset=utf-8")
+    assert [index for index, _, _ in items] == [0, 1]
+    assert items[0][1]["options"] == ["a", "b"]
+    assert items[1][1]["question_type"] == "theory"
+
+def test_unsupported_content_type():
+    with pytest.raises(HTTPException) as excinfo:
+        parse(b"<questions/>", "application/xml")
+    assert excinfo.value.status_code == 415
+
+def test_oversized_lines_are_per_item_errors(monkeypatch):
+    monkeypatch.setattr(server, "BULK_IMPORT_MAX_LINE_BYTES", 30)
+    long_line = b'{"question_text": "' + b"x" * 40 + b'"}'
+    body = b'{"question_text": "a"}\n' + long_line + b'\n{"question_text": "c"}\n' + long_line
+    items = parse(body, "application/x-ndjson")
+    assert [(index, item) for index, item, _ in items] == [(0, {"question_text": "a"}), (1, None), (2, {"question_text": "c"}), (3, None)]
+    assert items[1][2] == items[3][2] == "Line exceeds 30 bytes"
+
+def test_oversized_line_in_a_single_chunk(monkeypatch):
+    monkeypatch.setattr(server, "BULK_IMPORT_MAX_LINE_BYTES", 30)
+    body = b'{"question_text": "' + b"x" * 40 + b'"}\n{"question_text": "b"}'
+
+    async def collect():
+        return [item async for item in server.iter_bulk_items(make_request(body, "application/x-ndjson", chunk_size=len(body)))]
+
+    assert [(index, item) for index, item, _ in asyncio.run(collect())] == [(0, None), (1, {"question_text": "b"})]
+
+def test_invalid_utf8_is_a_per_item_error():
+    items = parse(b'\xff\xfe\n{"question_text": "b"}', "application/x-ndjson")
+    assert items[0][2].startswith("Invalid UTF-8")
+    assert items[1] == (1, {"question_text": "b"}, None)
+
+def test_oversized_csv_header(monkeypatch):
+    monkeypatch.setattr(server, "BULK_IMPORT_MAX_LINE_BYTES", 10)
+    with pytest.raises(HTTPException) as excinfo:
+        parse(b"question_text,question_type\nQ,theory\n", "text/csv")
+    assert excinfo.value.status_code == 400
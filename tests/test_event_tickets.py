@@ -0,0 +1,77 @@
+"""Stream tickets for the live monitor and query redaction."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend import server
+
+def make_user(role=server.UserRole.ADMIN):
+    return server.User(username="monitor", email="monitor@example.com", password="x", role=role)
+
+@pytest.fixture
+def known_user(monkeypatch):
+    user = make_user()
+
+    async def load_user(username):
+        return user if username == user.username else None
+
+    monkeypatch.setattr(server, "load_user", load_user)
+    return user
+
+def test_ticket_opens_the_stream(known_user):
+    ticket = server.create_event_ticket(known_user)
+    assert asyncio.run(server.get_stream_admin(ticket=ticket, credentials=None)) is known_user
+
+def test_ticket_is_not_an_access_token(known_user):
+    ticket = server.create_event_ticket(known_user)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.authenticate_token(ticket))
+    assert excinfo.value.status_code == 401
+
+def test_access_token_is_not_a_ticket(known_user):
+    token = server.create_access_token({"sub": known_user.username})
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_stream_admin(ticket=token, credentials=None))
+    assert excinfo.value.status_code == 401
+
+def test_expired_ticket_is_rejected(known_user, monkeypatch):
+    monkeypatch.setattr(server, "EVENT_TICKET_TTL_SECONDS", -1)
+    ticket = server.create_event_ticket(known_user)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_stream_admin(ticket=ticket, credentials=None))
+    assert excinfo.value.status_code == 401
+
+def test_student_ticket_is_forbidden(known_user):
+    known_user.role = server.UserRole.STUDENT
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_stream_admin(ticket=server.create_event_ticket(known_user), credentials=None))
+    assert excinfo.value.status_code == 403
+
+def test_redact_query():
+    assert server.redact_query("quiz_id=q1&ticket=abc.def&token=xyz&profile=1") == (
+        "quiz_id=q1&ticket=[redacted]&token=[redacted]&profile=1"
+    )
+    assert server.redact_query("") == ""
+
+def test_stream_does_not_advertise_automatic_retry(monkeypatch):
+    broker = server.EventBroker(4)
+    monkeypatch.setattr(server, "event_broker", broker)
+    subscriber_id, queue = broker.subscribe(None)
+
+    class Request:
+        async def is_disconnected(self):
+            return False
+
+    async def first_chunks():
+        stream = server.stream_events(Request(), subscriber_id, queue)
+        chunks = [await stream.__anext__()]
+        broker.publish("attempt_submitted", quiz_id="q1")
+        chunks.append(await stream.__anext__())
+        await stream.aclose()
+        return chunks
+
+    opening, event = asyncio.run(first_chunks())
+    assert "retry:" not in opening
+    assert event.startswith("event: attempt_submitted\ndata: ")
+    assert not broker.is_subscribed(subscriber_id)
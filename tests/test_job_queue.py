@@ -0,0 +1,63 @@
+"""Lease handling and retry limits of the background job queues."""
+import asyncio
+import types
+from datetime import timedelta
+
+from backend import server
+
+def matches(job, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(job, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = job.get(field)
+            if "$lt" in condition and not (value is not None and value < condition["$lt"]):
+                return False
+            if "$gte" in condition and not (value is not None and value >= condition["$gte"]):
+                return False
+        elif job.get(field) != condition:
+            return False
+    return True
+
+class StubJobs:
+    name = "jobs"
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    async def find_one_and_update(self, query, update, sort, return_document):
+        candidates = sorted((job for job in self.jobs if matches(job, query)), key=lambda job: job["created_at"])
+        if not candidates:
+            return None
+        job = candidates[0]
+        job.update(update["$set"])
+        job["tries"] += update["$inc"]["tries"]
+        return job
+
+    async def update_many(self, query, update):
+        matched = [job for job in self.jobs if matches(job, query)]
+        for job in matched:
+            job.update(update["$set"])
+        return types.SimpleNamespace(modified_count=len(matched))
+
+def make_job(job_id, status, tries, lease_expires_at=None):
+    return {"id": job_id, "status": status, "tries": tries, "created_at": server.utcnow(), "lease_expires_at": lease_expires_at}
+
+def make_queue(jobs):
+    return server.JobQueue(StubJobs(jobs), workers=1, poll_interval=1, lease_seconds=60, max_tries=3)
+
+def test_expired_lease_is_reclaimed_while_tries_remain():
+    expired = server.utcnow() - timedelta(seconds=1)
+    queue = make_queue([make_job("j1", "running", 2, expired)])
+    job = asyncio.run(queue.claim())
+    assert (job["id"], job["tries"], job["status"]) == ("j1", 3, "running")
+
+def test_job_past_its_tries_is_not_reclaimed_but_failed():
+    expired = server.utcnow() - timedelta(seconds=1)
+    jobs = [make_job("j1", "running", 3, expired), make_job("j2", "running", 1, server.utcnow() + timedelta(seconds=60))]
+    queue = make_queue(jobs)
+    assert asyncio.run(queue.claim()) is None
+    assert asyncio.run(queue.fail_abandoned()) == 1
+    assert [job["status"] for job in jobs] == ["failed", "running"]
+    assert queue.failed == 1
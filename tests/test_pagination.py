@@ -0,0 +1,44 @@
+"""Keyset cursor and field projection helpers."""
+import base64
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from backend import server
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 1, 12, 30, 15, 123000, tzinfo=timezone.utc)
+    assert server.decode_cursor(server.encode_cursor(timestamp, "abc")) == (timestamp, "abc")
+
+def test_cursor_is_url_safe():
+    cursor = server.encode_cursor(datetime(2024, 5, 1, tzinfo=timezone.utc), "a/b+c?")
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+def test_naive_cursor_timestamp_is_read_as_utc():
+    cursor = server.encode_cursor(datetime(2024, 5, 1, 12, 0), "abc")
+    timestamp, _ = server.decode_cursor(cursor)
+    assert timestamp == datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"{}").decode(),
+    base64.urlsafe_b64encode(b'{"t": "yesterday", "id": "x"}').decode(),
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        server.decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
+
+def test_parse_fields_always_includes_cursor_keys():
+    assert server.parse_fields(None, server.Question) is None
+    assert server.parse_fields(" question_text, points ,", server.Question) == {
+        "_id": 0, "id": 1, "created_at": 1, "question_text": 1, "points": 1,
+    }
+
+def test_parse_fields_rejects_unknown_fields():
+    with pytest.raises(HTTPException) as excinfo:
+        server.parse_fields("question_text,password", server.Question)
+    assert excinfo.value.status_code == 400
+    assert "password" in excinfo.value.detail
@@ -0,0 +1,54 @@
+"""Load shedding and cost tracking of the bounded password hashing pool."""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend import server
+
+@pytest.fixture
+def pool():
+    pool = server.PasswordWorkerPool("thread", max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown()
+
+def test_full_pool_sheds_load_and_releases_its_slots(pool):
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert (pool.in_flight, pool.queued) == (2, 1)
+        with pytest.raises(HTTPException) as excinfo:
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(*running)
+        return excinfo.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert error.headers == {"Retry-After": "1"}
+    stats = pool.stats()
+    assert (stats["in_flight"], stats["queued"], stats["completed"], stats["rejected"]) == (0, 0, 2, 1)
+
+def test_failed_work_releases_its_slot(pool):
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(pool.run(divmod, 1, 0))
+    assert (pool.in_flight, pool.completed) == (0, 1)
+
+def test_average_excludes_time_waiting_for_a_worker(pool):
+    release = threading.Event()
+    busy = pool.executor.submit(release.wait)
+    pool.avg_seconds = 0
+
+    async def queued_behind_busy_worker():
+        work = asyncio.create_task(pool.run(len, "instant"))
+        await asyncio.sleep(0.2)
+        release.set()
+        return await work
+
+    assert asyncio.run(queued_behind_busy_worker()) == 7
+    busy.result()
+    # Counting the 0.2s wait would have moved the average to 0.02
+    assert pool.avg_seconds < 0.005
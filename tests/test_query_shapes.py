@@ -0,0 +1,104 @@
+"""Query shapes recorded from MongoDB commands and their index coverage."""
+import asyncio
+
+import pytest
+
+from backend import server
+
+def record(command_name, command, collection="quizzes"):
+    recorder = server.QueryShapeRecorder(limit=10)
+    for query, sort in server.command_queries(command_name, command):
+        recorder.record(collection, query, sort)
+    return recorder.snapshot()
+
+def test_keyset_page_query():
+    # The query find_page sends for the second page of active quizzes
+    shapes = record("find", {
+        "find": "quizzes",
+        "filter": {"$and": [{"is_active": True}, {"$or": [
+            {"created_at": {"$gt": "t"}},
+            {"created_at": "t", "id": {"$gt": "x"}},
+        ]}]},
+        "sort": {"created_at": 1, "id": 1},
+    })
+    assert shapes == [
+        {"collection": "quizzes", "equality": ["is_active"], "range": ["created_at"], "sort": ["created_at", "id"], "count": 1},
+        {"collection": "quizzes", "equality": ["created_at", "is_active"], "range": ["id"], "sort": ["id"], "count": 1},
+    ]
+    assert all(server.index_covers([("is_active", 1), ("created_at", 1), ("id", 1)], shape) for shape in shapes)
+
+def test_each_or_branch_is_its_own_shape():
+    shapes = record("find", {"find": "users", "filter": {"is_active": True, "$or": [{"username": "a"}, {"email": "a"}]}}, collection="users")
+    assert [shape["equality"] for shape in shapes] == [["is_active", "username"], ["email", "is_active"]]
+
+def test_or_query_needs_an_index_for_every_branch(caplog):
+    recorder = server.QueryShapeRecorder(limit=10)
+    recorder.indexes["users"] = [[("_id", 1)], [("username", 1)]]
+    recorder.record("users", {"$or": [{"username": "a"}, {"email": "a"}]}, None)
+    warnings = [record.getMessage() for record in caplog.records if record.levelname == "WARNING"]
+    assert warnings == ["Query on users by ['email'] sorted by [] has no index"]
+
+def test_job_claim_query_is_covered(caplog):
+    recorder = server.QueryShapeRecorder(limit=10)
+    recorder.indexes["grading_jobs"] = [keys for keys, _ in server.INDEXES["grading_jobs"]]
+
+    class Collection:
+        async def find_one_and_update(self, query, update, sort, return_document):
+            recorder.record("grading_jobs", query, dict(sort))
+
+    queue = server.JobQueue(Collection(), workers=1, poll_interval=1, lease_seconds=60, max_tries=3)
+    asyncio.run(queue.claim())
+    assert len(recorder.snapshot()) == 2
+    assert [record.getMessage() for record in caplog.records if record.levelname == "WARNING"] == []
+
+def test_an_unfiltered_or_branch_is_a_full_scan():
+    assert record("find", {"find": "quizzes", "filter": {"$or": [{"is_active": True}, {}]}}) == []
+
+def test_aggregate_uses_leading_match_and_sort():
+    shapes = record("aggregate", {"aggregate": "quiz_attempts", "pipeline": [
+        {"$match": {"quiz_id": {"$in": ["a", "b"]}}},
+        {"$sort": {"started_at": -1}},
+        {"$group": {"_id": "$quiz_id"}},
+    ]}, collection="quiz_attempts")
+    assert shapes[0]["range"] == ["quiz_id"]
+    assert shapes[0]["sort"] == ["started_at"]
+
+def test_bulk_updates_fold_into_one_shape():
+    shapes = record("update", {"update": "quiz_attempts", "updates": [{"q": {"id": str(i)}, "u": {}} for i in range(5)]})
+    assert [(shape["equality"], shape["count"]) for shape in shapes] == [(["id"], 5)]
+
+def test_unfiltered_queries_and_inserts_are_not_recorded():
+    assert record("find", {"find": "quizzes", "filter": {}}) == []
+    assert record("insert", {"insert": "quizzes", "documents": [{"id": "x"}]}) == []
+
+def test_recorder_stops_at_its_limit():
+    recorder = server.QueryShapeRecorder(limit=1)
+    recorder.record("users", {"username": "a"}, None)
+    recorder.record("users", {"email": "a"}, None)
+    recorder.record("users", {"username": "b"}, None)
+    assert [(shape["equality"], shape["count"]) for shape in recorder.snapshot()] == [(["username"], 2)]
+    assert recorder.dropped == 1
+
+@pytest.mark.parametrize("keys, covered", [
+    ([("is_active", 1), ("created_at", 1), ("id", 1)], True),
+    ([("created_at", 1), ("id", 1)], False),
+    ([("is_active", 1)], False),
+    ([("_id", 1)], False),
+])
+def test_index_covers_equality_then_sort(keys, covered):
+    shape = {"equality": ["is_active"], "range": ["created_at", "id"], "sort": ["created_at", "id"]}
+    assert server.index_covers(keys, shape) is covered
+
+def test_index_covers_range_only_query():
+    shape = {"equality": [], "range": ["deadline_at"], "sort": []}
+    assert server.index_covers([("deadline_at", 1)], shape)
+    assert not server.index_covers([("submitted_at", 1), ("deadline_at", 1)], shape)
+
+def test_new_uncovered_shape_is_logged(caplog):
+    recorder = server.QueryShapeRecorder(limit=10)
+    recorder.indexes["users"] = [[("_id", 1)], [("username", 1)]]
+    recorder.record("users", {"username": "a"}, None)
+    recorder.record("users", {"email": "a"}, None)
+    recorder.record("users", {"email": "b"}, None)
+    warnings = [record.getMessage() for record in caplog.records if record.levelname == "WARNING"]
+    assert warnings == ["Query on users by ['email'] sorted by [] has no index"]
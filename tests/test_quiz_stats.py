@@ -0,0 +1,192 @@
+"""Materialized quiz statistics: increments, summaries and the rebuild pipeline."""
+import asyncio
+import types
+
+import pytest
+
+from backend import server
+from backend.server import SCORE_BUCKET_COUNT, TIME_TAKEN_BUCKETS
+
+def fold(submissions):
+    # What record_submissions would $inc into an empty quiz_stats document
+    stats = {"score_buckets": {}, "time_buckets": {}}
+    for score, max_score, time_taken in submissions:
+        for key, value in server.submission_stats_increment(score, max_score, time_taken).items():
+            if "." in key:
+                field, bucket = key.split(".")
+                stats[field][bucket] = stats[field].get(bucket, 0) + value
+            else:
+                stats[key] = stats.get(key, 0) + value
+    return stats
+
+def test_score_bucket_edges():
+    assert server.score_bucket(0, 10) == 0
+    assert server.score_bucket(5, 10) == 5
+    assert server.score_bucket(10, 10) == SCORE_BUCKET_COUNT - 1
+    assert server.score_bucket(3, 0) == 0
+
+def test_time_bucket_upper_bounds_are_inclusive():
+    assert server.time_bucket(0) == 0
+    assert server.time_bucket(TIME_TAKEN_BUCKETS[0]) == 0
+    assert server.time_bucket(TIME_TAKEN_BUCKETS[0] + 1) == 1
+    assert server.time_bucket(TIME_TAKEN_BUCKETS[-1] + 1) == len(TIME_TAKEN_BUCKETS)
+    assert server.time_bucket_label(len(TIME_TAKEN_BUCKETS)) == f"gt_{TIME_TAKEN_BUCKETS[-1]}s"
+
+def test_submission_increment():
+    assert server.submission_stats_increment(8, 10, 120) == {
+        "completed_attempts": 1,
+        "score_sum": 8,
+        "score_sq_sum": 64,
+        "percentage_sum": 80.0,
+        "time_taken_sum": 120,
+        "score_buckets.8": 1,
+        "time_buckets.1": 1,
+    }
+
+def test_estimate_percentile():
+    assert server.estimate_percentile({}, 0, 50) is None
+    # Ten attempts spread one per decile: the median sits at the 50% boundary
+    uniform = {str(i): 1 for i in range(SCORE_BUCKET_COUNT)}
+    assert server.estimate_percentile(uniform, SCORE_BUCKET_COUNT, 50) == 50.0
+    # Interpolation within a single decile
+    assert server.estimate_percentile({"7": 4}, 4, 50) == 75.0
+
+def test_summary_of_empty_stats():
+    summary = server.summarize_quiz_stats({})
+    assert summary["completed_attempts"] == 0
+    assert summary["average_score"] == 0
+    assert summary["estimated_median_percentage"] is None
+    assert sum(summary["score_histogram"].values()) == 0
+
+def test_summary_from_increments():
+    stats = {"total_attempts": 4, **fold([(10, 10, 30), (5, 10, 200), (0, 10, 4000)])}
+    summary = server.summarize_quiz_stats(stats)
+    assert summary["total_attempts"] == 4
+    assert summary["completed_attempts"] == 3
+    assert summary["average_score"] == 5.0
+    assert summary["score_stddev"] == 4.08
+    assert summary["average_percentage"] == 50.0
+    assert summary["score_histogram"]["90-100"] == 1
+    assert summary["score_histogram"]["0-10"] == 1
+    assert summary["time_taken_distribution"] == {"le_60s": 1, "le_300s": 1, "le_600s": 0, "le_1800s": 0, "le_3600s": 0, "gt_3600s": 1}
+    assert set(summary["estimated_percentage_percentiles"]) == {f"p{p}" for p in server.SCORE_PERCENTILES}
+
+def test_rebuild_pipeline_scopes_to_quizzes():
+    assert server.quiz_stats_pipeline(["q1"])[0] == {"$match": {"quiz_id": {"$in": ["q1"]}}}
+    assert "$match" not in server.quiz_stats_pipeline()[0]
+
+def test_rebuilt_document_matches_live_increments():
+    submissions = [(10, 10, 30), (5, 10, 200)]
+    folded = fold(submissions)
+    row = {
+        "_id": "q1",
+        "total_attempts": 3,
+        **{field: folded[field] for field in ("completed_attempts", "score_sum", "score_sq_sum", "percentage_sum", "time_taken_sum")},
+        **{f"s{i}": folded["score_buckets"].get(str(i), 0) for i in range(SCORE_BUCKET_COUNT)},
+        **{f"t{i}": folded["time_buckets"].get(str(i), 0) for i in range(len(TIME_TAKEN_BUCKETS) + 1)},
+    }
+    assert server.quiz_stats_document(row) == {"quiz_id": "q1", "total_attempts": 3, **folded}
+
+def test_rebuilt_document_without_completions():
+    row = {
+        "_id": "q1",
+        "total_attempts": 2,
+        "completed_attempts": 0,
+        "score_sum": 0,
+        "score_sq_sum": 0,
+        "percentage_sum": 0,
+        "time_taken_sum": 0,
+        **{f"s{i}": 0 for i in range(SCORE_BUCKET_COUNT)},
+        **{f"t{i}": 0 for i in range(len(TIME_TAKEN_BUCKETS) + 1)},
+    }
+    assert server.quiz_stats_document(row) == {"quiz_id": "q1", "total_attempts": 2, "score_buckets": {}, "time_buckets": {}}
+
+def test_attempt_contribution():
+    submitted = {"submitted_at": "t", "score": 8, "max_score": 10, "time_taken": 120, "grading_status": "complete"}
+    assert server.attempt_stats_contribution(submitted) == server.submission_stats_increment(8, 10, 120)
+    assert server.attempt_stats_contribution({**submitted, "grading_status": "pending"}) == {}
+    assert server.attempt_stats_contribution({**submitted, "submitted_at": None}) == {}
+
+def test_stats_difference_is_the_increment_between_documents():
+    current = {"quiz_id": "q1", "total_attempts": 3, **fold([(10, 10, 30), (5, 10, 200)])}
+    target = {"quiz_id": "q1", "total_attempts": 3, **fold([(10, 10, 30), (7, 10, 200)])}
+    assert server.stats_difference(target, current) == {
+        "score_sum": 2,
+        "score_sq_sum": 24,
+        "percentage_sum": 20.0,
+        "score_buckets.5": -1,
+        "score_buckets.7": 1,
+    }
+    assert server.stats_difference(current, current) == {}
+
+class StubCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+class StubAttempts:
+    # Applies updates the way MongoDB would; `race` runs once before the first write
+    def __init__(self, attempts, race=None):
+        self.attempts = {attempt["id"]: dict(attempt) for attempt in attempts}
+        self.race = race
+
+    async def bulk_write(self, operations, ordered):
+        if self.race:
+            self.race(self.attempts)
+            self.race = None
+        matched = 0
+        for operation in operations:
+            query, update = operation._filter, operation._doc
+            attempt = self.attempts.get(query["id"])
+            if attempt and all(attempt.get(field) == value for field, value in query.items()):
+                attempt.update(update["$set"])
+                matched += 1
+        return types.SimpleNamespace(matched_count=matched)
+
+    def find(self, query, projection=None):
+        ids = query["id"]["$in"]
+        version = query.get("regrade_version")
+        return StubCursor([
+            dict(self.attempts[attempt_id]) for attempt_id in ids
+            if attempt_id in self.attempts and (version is None or self.attempts[attempt_id].get("regrade_version") == version)
+        ])
+
+class StubStats:
+    def __init__(self):
+        self.increments = []
+
+    async def update_one(self, query, update, upsert):
+        self.increments.append(update["$inc"])
+
+def test_regrade_adjusts_stats_by_each_attempts_change(monkeypatch):
+    objective = {"id": "obj", "question_text": "Q", "question_type": "objective", "options": ["a", "b"],
+                 "correct_answer": "b", "explanation": "", "points": 10, "rubric": None}
+    answer_key = server.AnswerKey({"id": "q1", "questions": ["obj"], "time_limit": 30}, [objective])
+    attempts = [
+        {"id": "a1", "answers": {"obj": "b"}, "score": 0, "max_score": 10, "time_taken": 30, "submitted_at": "t", "grading_status": "complete"},
+        {"id": "a2", "answers": {"obj": "b"}, "score": 0, "max_score": 10, "time_taken": 30, "submitted_at": "t", "grading_status": "pending"},
+    ]
+
+    def grading_worker_finishes(stored):
+        stored["a2"].update(score=0, grading_status="complete")
+
+    stats = StubStats()
+    monkeypatch.setattr(server, "db", types.SimpleNamespace(quiz_attempts=StubAttempts(attempts, grading_worker_finishes), quiz_stats=stats))
+    assert asyncio.run(server.RegradeQueue.write_batch(None, answer_key, attempts)) == 2
+    # a1 moves from 0 to 10; a2 was counted at 0 by the grading worker, then regraded to 10
+    assert stats.increments == [{
+        "score_sum": 20,
+        "score_sq_sum": 200,
+        "percentage_sum": 200.0,
+        "score_buckets.0": -2,
+        "score_buckets.9": 2,
+    }]
@@ -0,0 +1,100 @@
+"""Behavior of the compiled theory rubric scorer and answer-key grading."""
+import uuid
+
+import pytest
+
+from backend import server
+from backend.server import AnswerKey, CompiledRubric, THEORY_PASS_RATIO
+
+def make_question(question_type="theory", correct_answer="kinetic energy is converted into heat", rubric=None, points=2):
+    return {
+        "id": str(uuid.uuid4()),
+        "question_text": "Question",
+        "question_type": question_type,
+        "options": ["alpha", "beta"] if question_type == "objective" else None,
+        "correct_answer": correct_answer,
+        "explanation": "Because",
+        "points": points,
+        "rubric": rubric,
+    }
+
+def make_answer_key(questions):
+    quiz = {"id": str(uuid.uuid4()), "questions": [question["id"] for question in questions], "time_limit": 30}
+    return AnswerKey(quiz, questions)
+
+def test_tokenize_lowercases_and_keeps_apostrophes():
+    assert server.tokenize("Newton's 2nd LAW, restated!") == ["newton's", "2nd", "law", "restated"]
+
+def test_default_rubric_uses_non_stopword_tokens_of_correct_answer():
+    rubric = CompiledRubric.from_question(make_question())
+    assert rubric.vocabulary == {("kinetic",), ("energy",), ("converted",), ("heat",)}
+
+def test_default_rubric_passes_with_half_of_the_keywords():
+    rubric = CompiledRubric.from_question(make_question())
+    assert rubric.score("heat from kinetic motion") == 0.5
+    assert rubric.score("heat from kinetic motion") >= THEORY_PASS_RATIO
+    assert rubric.score("it turns into heat") < THEORY_PASS_RATIO
+
+def test_stopwords_alone_do_not_score():
+    rubric = CompiledRubric.from_question(make_question())
+    assert rubric.score("it is converted into the") == 0.25
+
+def test_rubric_weights_and_synonyms():
+    rubric = CompiledRubric.from_question(make_question(rubric=[
+        {"keywords": ["friction", "drag"], "weight": 3},
+        {"keywords": ["heat"], "weight": 1},
+    ]))
+    assert rubric.score("friction and drag make heat") == 1.0
+    assert rubric.score("drag slows it") == 0.75
+    assert rubric.score("only heat") == 0.25
+
+def test_phrases_match_only_as_contiguous_tokens():
+    rubric = CompiledRubric.from_question(make_question(rubric=[{"keywords": ["kinetic energy"], "weight": 1}]))
+    assert rubric.score("Kinetic energy becomes heat") == 1.0
+    assert rubric.score("energy that is kinetic") == 0.0
+
+def test_answer_only_of_stopwords_requires_a_non_blank_answer():
+    rubric = CompiledRubric.from_question(make_question(correct_answer="it is as it was"))
+    assert rubric.score_batch(["anything at all", "   "]) == [1.0, 0.0]
+
+def test_score_batch_matches_individual_scores():
+    rubric = CompiledRubric.from_question(make_question())
+    answers = ["kinetic energy to heat", "", "converted energy", "unrelated"]
+    assert rubric.score_batch(answers) == [rubric.score(answer) for answer in answers]
+
+def test_objective_answers_ignore_case_and_whitespace():
+    objective = make_question("objective", correct_answer="Beta", points=1)
+    score, results = make_answer_key([objective]).grade({objective["id"]: "  beta "})
+    assert score == 1
+    assert results[objective["id"]]["is_correct"] is True
+
+def test_deferred_theory_is_left_ungraded():
+    objective = make_question("objective", correct_answer="beta", points=1)
+    theory = make_question()
+    answer_key = make_answer_key([objective, theory])
+    score, results = answer_key.grade({objective["id"]: "beta", theory["id"]: "kinetic energy and heat"}, defer_theory=True)
+    assert score == 1
+    assert results[theory["id"]]["is_correct"] is None
+    assert answer_key.theory_question_ids == [theory["id"]]
+    assert answer_key.max_score == 3
+
+def test_grade_batch_matches_grade_per_submission():
+    objective = make_question("objective", correct_answer="beta", points=1)
+    theory = make_question()
+    answer_key = make_answer_key([objective, theory])
+    answer_sets = [
+        {objective["id"]: "beta", theory["id"]: "kinetic energy becomes heat"},
+        {objective["id"]: "alpha", theory["id"]: "energy"},
+        {},
+    ]
+    graded = answer_key.grade_batch(answer_sets)
+    assert [score for score, _ in graded] == [answer_key.grade(answers)[0] for answers in answer_sets]
+    assert [score for score, _ in graded] == [3, 0, 0]
+    assert graded[0][1][theory["id"]] == {"is_correct": True, "rubric_score": 0.75, "points": 2}
+    assert graded[1][1][theory["id"]] == {"is_correct": False, "rubric_score": 0.25, "points": 0}
+
+def test_grade_theory_reports_rubric_scores():
+    theory = make_question()
+    score, results = make_answer_key([theory]).grade_theory({theory["id"]: "heat"})
+    assert score == 0
+    assert results[theory["id"]] == {"is_correct": False, "rubric_score": 0.25, "points": 0}